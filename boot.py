@@ -2,8 +2,13 @@
 # Make Sublime aware of our *{Command,Listener,Handler} classes by importing them:
 from .src.blame import *  # noqa: F401,F403
 from .src.blame_all import *  # noqa: F401,F403
+from .src.blame_backfill import *  # noqa: F401,F403
+from .src.blame_diagnostics import *  # noqa: F401,F403
+from .src.blame_history import *  # noqa: F401,F403
 from .src.blame_inline import *  # noqa: F401,F403
 from .src.blame_instadiff import *  # noqa: F401,F403
+from .src.blame_optimise import *  # noqa: F401,F403
+from .src.memory import *  # noqa: F401,F403
 
 # def plugin_loaded():
 #     pass
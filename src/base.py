@@ -1,101 +1,187 @@
-import os
-import re
 import subprocess
-import sys
 from abc import ABCMeta, abstractmethod
 from urllib.parse import parse_qs, urlparse
 
 import sublime
 
-from .settings import PKG_SETTINGS_KEY_CUSTOMBLAMEFLAGS, pkg_settings
+from . import engine
+from .cache import estimate_size
+from .engine import (  # noqa: F401
+    BlameEngine,
+    HistoryNotLocalError,
+    NotTrackedError,
+    git_startupinfo,
+    paths_too_slow_for_expensive_blame,
+    shas_missing_locally,
+)
+from .prefetch import commit_prefetcher
+from .settings import PKG_SETTINGS_KEY_LATENCY_BUDGETS, pkg_settings
+
+
+def package_engine():
+    """An engine that isn't working on behalf of any particular view."""
+    return BlameEngine(pkg_settings(), notify=sublime.status_message)
+
+
+def shared_cache():
+    return package_engine().cache()
+
+
+class BaseEngineCommand(metaclass=ABCMeta):
+    """
+    For commands that use BlameEngine on behalf of a view's file, and report any errors
+    to the user, but don't show blame results in it (see BaseBlame for those).
+    """
+
+    # Which entry of the latency budgets setting applies to this command's git
+    # processes. None means they're allowed to take as long as they take.
+    LATENCY_BUDGET_MODE = None  # type: str | None # type: ignore[misc]
+
+    def blame_engine(self):
+        return BlameEngine(
+            pkg_settings(),
+            latency_budget_mode=self.LATENCY_BUDGET_MODE,
+            owner_id=self._view().id(),
+            notify=sublime.status_message,
+        )
+
+    def run_git(self, view_file_path, cli_args, cache_key=None, allow_lazy_fetch=False):
+        return self.blame_engine().run_git(
+            view_file_path, cli_args, cache_key, allow_lazy_fetch=allow_lazy_fetch
+        )
+
+    def show_commit(self, sha):
+        try:
+            desc = self.blame_engine().get_commit_fulltext(
+                sha, self._view().file_name()
+            )
+        except Exception as e:
+            self.communicate_error(e)
+            return
+
+        # @todo (Optionally?) show the diff using Tab-Multi-Select rather than over the top of the current Group?
+        buf = self._view().window().new_file()
+        buf.run_command(
+            "blame_insert_commit_description",
+            {"desc": desc, "scratch_view_name": "commit " + sha},
+        )
+
+    def has_suitable_view(self):
+        view = self._view()
+        return view.file_name() and not view.is_dirty()
 
+    def tell_user_to_save(self):
+        self.communicate_error("Please save file changes to disk first.")
+
+    def communicate_error(self, e, modal=True):
+        user_msg = "Git blame:\n\n{0}".format(e)
+        if isinstance(e, subprocess.CalledProcessError):
+            user_msg += "\n\n{0}".format(e.output.decode())
+        elif isinstance(e, subprocess.TimeoutExpired):
+            user_msg += "\n\nThe limit can be changed in the {0} setting.".format(
+                PKG_SETTINGS_KEY_LATENCY_BUDGETS
+            )
 
-class BaseBlame(metaclass=ABCMeta):
-    def run_git(self, view_file_path, cli_args):
-        if sys.platform == "win32":
-            startup_info = subprocess.STARTUPINFO()
-            # Stop a visible console window from appearing.
-            startup_info.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            startup_info.wShowWindow = subprocess.SW_HIDE
+        print()  # noqa: T201
+        if modal:
+            sublime.error_message(user_msg)
         else:
-            startup_info = None
+            sublime.status_message(user_msg)
+            # Unlike with the error dialog, a status message is not automatically
+            # persisted in the console too.
+            print(user_msg)  # noqa: T201
 
-        cmd_line = ["git"] + cli_args
-        # print(cmd_line)
+    # ------------------------------------------------------------
 
-        return subprocess.check_output(
-            cmd_line,
-            cwd=os.path.dirname(os.path.realpath(view_file_path)),
-            startupinfo=startup_info,
-            stderr=subprocess.STDOUT,
-        ).decode()
+    @abstractmethod
+    def _view(self):
+        ...
 
-    def get_blame_text(self, path, **kwargs):
-        cli_args = ["blame", "--show-name", "--minimal", "-w"]
-        cli_args.extend(self.extra_cli_args(**kwargs))
-        cli_args.extend(pkg_settings().get(PKG_SETTINGS_KEY_CUSTOMBLAMEFLAGS, []))
-        cli_args.extend(["--", os.path.basename(path)])
-        return self.run_git(path, cli_args)
 
-    def get_commit_fulltext(self, sha, path):
-        cli_args = ["show", "--no-color", sha]
-        return self.run_git(path, cli_args)
+class BaseBlame(BaseEngineCommand):
+    """
+    Adapts BlameEngine, which does the actual work, to a view in the editor: it decides
+    which view the engine works on behalf of, and shows the results.
+    """
 
-    def get_commit_message_subject(self, sha, path):
-        cli_args = ["show", "--no-color", sha, "--pretty=format:%s", "--no-patch"]
-        return self.run_git(path, cli_args)
+    def blame_cli_args(self, path, unbounded=False, **kwargs):
+        return self.blame_engine().blame_cli_args(
+            path, self.extra_cli_args(**kwargs), unbounded
+        )
 
     @classmethod
-    def parse_line(cls, line):
-        pattern = r"""(?x)
-            ^   (?P<sha>\^?\w+)
-            \s+ (?P<file>[\S ]+)
-            \s+
-            \(  (?P<author>.+?)
-            \s+ (?P<date>\d{4}-\d{2}-\d{2})
-            \s+ (?P<time>\d{2}:\d{2}:\d{2})
-            \s+ (?P<timezone>[\+-]\d+)
-            \s+ (?P<line_number>\d+)
-            \)
-            \s
-            """
-        # re's module-level functions like match(...) internally cache the compiled form of pattern strings.
-        m = re.match(pattern, line)
-        return cls.postprocess_parse_result(m)
-
-    # @todo Add a test for the `parse_line_with_relative_date` function in test_parsing.py
+    def depth_bound_cli_args(cls):
+        return package_engine().depth_bound_cli_args()
+
     @classmethod
-    def parse_line_with_relative_date(cls, line):
+    def depth_bound_description(cls):
+        return package_engine().depth_bound_description()
+
+    @classmethod
+    def is_beyond_depth_bound(cls, blame, unbounded=False):
+        return package_engine().is_beyond_depth_bound(blame, unbounded)
+
+    def is_blame_cached(self, path, unbounded=False, **kwargs):
+        return self.blame_engine().is_blame_cached(
+            path, self.extra_cli_args(**kwargs), unbounded
+        )
+
+    def get_blame_text(self, path, unbounded=False, **kwargs):
+        return self.blame_engine().get_blame_text(
+            path, self.extra_cli_args(**kwargs), unbounded
+        )
+
+    def is_tracked(self, path):
+        return self.blame_engine().is_tracked(path)
+
+    @classmethod
+    def commit_fulltext_cli_args(cls, sha):
+        return engine.commit_fulltext_cli_args(sha)
+
+    def get_commit_message_subject(self, sha, path):
+        return self.blame_engine().get_commit_message_subject(sha, path)
+
+    def prefetch_commits(self, shas):
         """
-        The difference from parse_line is that date/time/timezone are replaced with relative_date
-        to be able to parse human readable format
-        https://github.com/git/git/blob/c09b6306c6ca275ed9d0348a8c8014b2ff723cfb/date.c#L131
+        Fetch the full text of the given commits in the background, on the basis that
+        the user is likely to click [Show] for one of them next. Replaces whatever was
+        previously being prefetched for this command's phantoms.
         """
-        pattern = r"""(?x)
-            ^   (?P<sha>\^?\w+)
-            \s+ (?P<file>[\S ]+)
-            \s+
-            \(  (?P<author>.+?)
-            \s+ (?P<relative_date>\d+.+ago)
-            \s+ (?P<line_number>\d+)
-            \)
-            \s
-            """
-        # re's module-level functions like match(...) internally cache the compiled form of pattern strings.
-        m = re.match(pattern, line)
-        return cls.postprocess_parse_result(m)
+        self.blame_engine().prefetch_commits(
+            self.prefetch_owner(), self._view().file_name(), shas
+        )
+
+    def cancel_prefetch(self):
+        commit_prefetcher.cancel(self.prefetch_owner())
+
+    def prefetch_owner(self):
+        return (self._view().id(), self.phantom_set_key())
+
+    def account_phantoms(self, phantoms):
+        """
+        Record how much memory the rendered HTML of this command's phantoms is taking
+        up, so that it counts against the package's cache budget. If they need to be
+        evicted, they're simply closed.
+        """
+        cache_key = self.rendered_html_cache_key(self._view())
+        if not phantoms:
+            shared_cache().discard(cache_key)
+            return
+        shared_cache().put(
+            cache_key,
+            None,
+            view_id=self._view().id(),
+            size=sum(estimate_size(p.content) for p in phantoms),
+            on_evict=lambda: sublime.set_timeout(self.close_by_user_request, 0),
+        )
 
     @classmethod
-    def postprocess_parse_result(cls, match):
-        if match:
-            d = match.groupdict()
-            # The SHA output by `git blame` may have a leading caret to indicate that it
-            # is a "boundary commit". That needs to be stripped before passing the SHA
-            # back to git CLI commands for other purposes.
-            d["sha_normalised"] = d["sha"].strip("^")
-            return d
-        else:
-            return {}
+    def parse_line(cls, line):
+        return engine.parse_line(line)
+
+    @classmethod
+    def parse_line_with_relative_date(cls, line):
+        return engine.parse_line_with_relative_date(line)
 
     def handle_phantom_button(self, href):
         url = urlparse(href)
@@ -107,29 +193,21 @@ class BaseBlame(metaclass=ABCMeta):
             sublime.set_clipboard(querystring["sha"][0])
             sublime.status_message("Git SHA copied to clipboard")
         elif url.path == "show":
-            sha = querystring["sha"][0]
-            try:
-                desc = self.get_commit_fulltext(sha, self._view().file_name())
-            except Exception as e:
-                self.communicate_error(e)
-                return
-
-            # @todo (Optionally?) show the diff using Tab-Multi-Select rather than over the top of the current Group?
-            buf = self._view().window().new_file()
-            buf.run_command(
-                "blame_insert_commit_description",
-                {"desc": desc, "scratch_view_name": "commit " + sha},
-            )
+            self.show_commit(querystring["sha"][0])
         elif url.path == "prev":
             sha = querystring["sha"][0]
             row_num = querystring["row_num"][0]
             sha_skip_list = querystring.get("skip", [])
-            if sha not in sha_skip_list:
+            # For a line that was last changed before the depth bound, the boundary
+            # commit isn't skipped over. The line is just looked up again without the
+            # bound (and stays that way for any further [Prev] clicks).
+            if sha not in sha_skip_list and "boundary" not in querystring:
                 sha_skip_list.append(sha)
             self.rerun(
                 prevving=True,
                 fixed_row_num=int(row_num),
                 sha_skip_list=sha_skip_list,
+                unbounded="unbounded" in querystring,
             )
         elif url.path == "close":
             self.close_by_user_request()
@@ -138,36 +216,15 @@ class BaseBlame(metaclass=ABCMeta):
                 "No handler for URL path '{0}' in phantom".format(url.path)
             )
 
-    def has_suitable_view(self):
-        view = self._view()
-        return view.file_name() and not view.is_dirty()
-
-    def tell_user_to_save(self):
-        self.communicate_error("Please save file changes to disk first.")
-
-    def communicate_error(self, e, modal=True):
-        user_msg = "Git blame:\n\n{0}".format(e)
-        if isinstance(e, subprocess.CalledProcessError):
-            user_msg += "\n\n{0}".format(e.output.decode())
-
-        print()  # noqa: T201
-        if modal:
-            sublime.error_message(user_msg)
-        else:
-            sublime.status_message(user_msg)
-            # Unlike with the error dialog, a status message is not automatically
-            # persisted in the console too.
-            print(user_msg)  # noqa: T201
-
     @classmethod
     def phantom_set_key(cls):
         return "git-blame" + cls.__name__
 
-    # ------------------------------------------------------------
+    @classmethod
+    def rendered_html_cache_key(cls, view):
+        return ("html", view.id(), cls.phantom_set_key())
 
-    @abstractmethod
-    def _view(self):
-        ...
+    # ------------------------------------------------------------
 
     @abstractmethod
     def close_by_user_request(self):
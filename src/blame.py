@@ -1,26 +1,41 @@
+from html import escape
 from urllib.parse import quote_plus
 
 import sublime
 import sublime_plugin
 
 from .base import BaseBlame
-from .templates import blame_phantom_css, blame_phantom_html_template
+from .templates import (
+    blame_phantom_css,
+    blame_phantom_html_template,
+    depth_bound_marker,
+)
 
 
 class Blame(BaseBlame, sublime_plugin.TextCommand):
 
+    LATENCY_BUDGET_MODE = "line"
+
     # Overrides (TextCommand) ----------------------------------------------------------
 
     def __init__(self, view):
         super().__init__(view)
         self.phantom_set = sublime.PhantomSet(view, self.phantom_set_key())
 
-    def run(self, edit, prevving=False, fixed_row_num=None, sha_skip_list=[]):
+    def run(
+        self,
+        edit,
+        prevving=False,
+        fixed_row_num=None,
+        sha_skip_list=[],
+        unbounded=False,
+    ):
         if not self.has_suitable_view():
             self.tell_user_to_save()
             return
 
         phantoms = []
+        shas = []
 
         if prevving:
             # We'll be getting blame information for the line whose existing phantom's
@@ -50,7 +65,10 @@ class Blame(BaseBlame, sublime_plugin.TextCommand):
 
             try:
                 blame_output = self.get_blame_text(
-                    full_path, line_num=line_num, sha_skip_list=sha_skip_list
+                    full_path,
+                    line_num=line_num,
+                    sha_skip_list=sha_skip_list,
+                    unbounded=unbounded,
                 )
             except Exception as e:
                 self.communicate_error(e)
@@ -69,8 +87,9 @@ class Blame(BaseBlame, sublime_plugin.TextCommand):
             author = blame["author"]
             date = blame["date"]
             time = blame["time"]
+            beyond_depth_bound = self.is_beyond_depth_bound(blame, unbounded)
 
-            if sha_skip_list:
+            if sha_skip_list and not beyond_depth_bound:
                 recently_skipped_sha = sha_skip_list[-1]
                 if sha_normalised == recently_skipped_sha:
                     sublime.message_dialog(
@@ -78,6 +97,19 @@ class Blame(BaseBlame, sublime_plugin.TextCommand):
                     )
                     return
 
+            depth_bound_indicator = ""
+            qs_bound_keyvals = ""
+            if beyond_depth_bound:
+                depth_bound_indicator = " ({0})".format(
+                    depth_bound_marker.format(
+                        bound=escape(self.depth_bound_description())
+                    )
+                )
+                qs_bound_keyvals = "&amp;unbounded=1&amp;boundary=1"
+            elif unbounded:
+                qs_bound_keyvals = "&amp;unbounded=1"
+
+            shas.append(sha_normalised)
             phantoms.append(
                 sublime.Phantom(
                     line_region,
@@ -85,6 +117,7 @@ class Blame(BaseBlame, sublime_plugin.TextCommand):
                         css=blame_phantom_css,
                         sha=sha,
                         sha_not_latest_indicator=" *" if sha_skip_list else "",
+                        depth_bound_indicator=depth_bound_indicator,
                         author=author,
                         date=date,
                         time=time,
@@ -99,6 +132,7 @@ class Blame(BaseBlame, sublime_plugin.TextCommand):
                                 for skipee in sha_skip_list
                             ]
                         ),
+                        qs_bound_keyvals=qs_bound_keyvals,
                     ),
                     sublime.LAYOUT_BLOCK,
                     self.handle_phantom_button,
@@ -106,6 +140,8 @@ class Blame(BaseBlame, sublime_plugin.TextCommand):
             )
 
         self.phantom_set.update(phantoms)
+        self.account_phantoms(phantoms)
+        self.prefetch_commits(shas)
 
     # Overrides (BaseBlame) ------------------------------------------------------------
 
@@ -114,6 +150,8 @@ class Blame(BaseBlame, sublime_plugin.TextCommand):
 
     def close_by_user_request(self):
         self.phantom_set.update([])
+        self.account_phantoms([])
+        self.cancel_prefetch()
 
     def extra_cli_args(self, line_num, sha_skip_list):
         args = ["-L", "{0},{0}".format(line_num)]
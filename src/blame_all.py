@@ -1,8 +1,14 @@
+from html import escape
+
 import sublime
 import sublime_plugin
 
-from .base import BaseBlame
-from .templates import blame_all_phantom_css, blame_all_phantom_html_template
+from .base import BaseBlame, shared_cache
+from .templates import (
+    blame_all_phantom_css,
+    blame_all_phantom_html_template,
+    depth_bound_marker,
+)
 
 VIEW_SETTINGS_KEY_PHANTOM_ALL_DISPLAYED = "git-blame-all-displayed"
 VIEW_SETTINGS_KEY_RULERS = "rulers"  # A stock ST setting
@@ -11,6 +17,7 @@ VIEW_SETTINGS_KEY_RULERS_PREV = "rulers_prev"  # Made up by us
 
 class BlameShowAll(BaseBlame, sublime_plugin.TextCommand):
 
+    LATENCY_BUDGET_MODE = "show_all"
     HORIZONTAL_SCROLL_DELAY_MS = 100
 
     # Overrides (TextCommand) ----------------------------------------------------------
@@ -31,6 +38,7 @@ class BlameShowAll(BaseBlame, sublime_plugin.TextCommand):
         # If they are currently shown, toggle them off and return.
         if self.view.settings().get(VIEW_SETTINGS_KEY_PHANTOM_ALL_DISPLAYED, False):
             self.phantom_set.update(phantoms)
+            self.account_phantoms(phantoms)
             self.view.settings().erase(VIEW_SETTINGS_KEY_PHANTOM_ALL_DISPLAYED)
             self.view.run_command("blame_restore_rulers")
             # Workaround a visible empty space sometimes remaining in the viewport.
@@ -54,6 +62,16 @@ class BlameShowAll(BaseBlame, sublime_plugin.TextCommand):
             )
             return
 
+        for blame in blames:
+            if self.is_beyond_depth_bound(blame):
+                # Who changed these lines before the bound wasn't looked up, so git's
+                # attribution of them to the boundary commit would be misleading.
+                blame["author"] = depth_bound_marker.format(
+                    bound=self.depth_bound_description()
+                )
+                blame["date"] = " " * len(blame["date"])
+                blame["time"] = " " * len(blame["time"])
+
         max_author_len = max(len(b["author"]) for b in blames)
         for blame in blames:
             line_number = int(blame["line_number"])
@@ -64,9 +82,9 @@ class BlameShowAll(BaseBlame, sublime_plugin.TextCommand):
                 blame_all_phantom_html_template.format(
                     css=blame_all_phantom_css,
                     sha=blame["sha"],
-                    author=author + "&nbsp;" * (max_author_len - len(author)),
-                    date=blame["date"],
-                    time=blame["time"],
+                    author=escape(author) + "&nbsp;" * (max_author_len - len(author)),
+                    date=blame["date"].replace(" ", "&nbsp;"),
+                    time=blame["time"].replace(" ", "&nbsp;"),
                 ),
                 sublime.LAYOUT_INLINE,
                 self.handle_phantom_button,
@@ -74,6 +92,7 @@ class BlameShowAll(BaseBlame, sublime_plugin.TextCommand):
             phantoms.append(phantom)
 
         self.phantom_set.update(phantoms)
+        self.account_phantoms(phantoms)
         self.view.settings().set(VIEW_SETTINGS_KEY_PHANTOM_ALL_DISPLAYED, True)
         self.store_rulers()
         # Bring the phantoms into view without the user needing to manually scroll left.
@@ -123,6 +142,7 @@ class BlameEraseAll(sublime_plugin.TextCommand):
     def run(self, edit):
         sublime.status_message("The git blame result is cleared.")
         self.view.erase_phantoms(BlameShowAll.phantom_set_key())
+        shared_cache().discard(BlameShowAll.rendered_html_cache_key(self.view))
         self.view.settings().erase(VIEW_SETTINGS_KEY_PHANTOM_ALL_DISPLAYED)
         self.view.run_command("blame_restore_rulers")
 
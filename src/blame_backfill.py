@@ -0,0 +1,59 @@
+import sublime
+import sublime_plugin
+
+from .base import BaseEngineCommand, shas_missing_locally
+from .engine import commit_fulltext_cli_args
+from .repo import find_repo, is_partial_clone, repo_key
+
+
+class BlameFetchMissingHistory(BaseEngineCommand, sublime_plugin.TextCommand):
+
+    # Overrides (TextCommand) ----------------------------------------------------------
+
+    def run(self, edit):
+        if not self.has_suitable_view():
+            self.tell_user_to_save()
+            return
+
+        path = self.view.file_name()
+        repo = find_repo(path)
+        if repo is None or not is_partial_clone(repo):
+            sublime.message_dialog(
+                "Git blame:\n\nThis repository is not a partial clone, so all of its "
+                "history is already available locally."
+            )
+            return
+
+        sublime.set_timeout_async(lambda: self.backfill(path), 0)
+
+    # Overrides (BaseEngineCommand) ----------------------------------------------------
+
+    def _view(self):
+        return self.view
+
+    # Overrides end --------------------------------------------------------------------
+
+    def backfill(self, path):
+        """
+        Let git lazily fetch whatever it needs to blame the whole file, and to show any
+        commits that previously couldn't be shown.
+        """
+        sublime.status_message("Git blame: Fetching missing history...")
+        shas = shas_missing_locally.get(repo_key(path), set())
+        try:
+            engine = self.blame_engine()
+            # Beyond any depth bound too, as [Prev] and Instadiff look there.
+            engine.run_git(
+                path,
+                engine.blame_cli_args(path, [], unbounded=True),
+                allow_lazy_fetch=True,
+            )
+            for sha in sorted(shas):
+                engine.run_git(
+                    path, commit_fulltext_cli_args(sha), allow_lazy_fetch=True
+                )
+        except Exception as e:
+            self.communicate_error(e)
+            return
+        shas_missing_locally.pop(repo_key(path), None)
+        sublime.status_message("Git blame: Fetched the missing history")
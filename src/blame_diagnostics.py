@@ -0,0 +1,34 @@
+import json
+
+import sublime_plugin
+
+from .base import shared_cache
+from .engine import tracked_index_stats
+from .latency import inline_blame_latency
+from .prefetch import commit_prefetcher
+from .singleflight import git_single_flight
+
+
+class BlameShowDiagnostics(sublime_plugin.WindowCommand):
+
+    # Overrides begin ------------------------------------------------------------------
+
+    def run(self):
+        diagnostics = {
+            "cache": shared_cache().stats(),
+            "prefetch": commit_prefetcher.stats(),
+            "inline_blame_latency": inline_blame_latency.stats(),
+            "git_single_flight": git_single_flight.stats(),
+            "tracked_files": tracked_index_stats(),
+        }
+        view = self.window.new_file()
+        view.set_scratch(True)
+        view.assign_syntax("Packages/JavaScript/JSON.sublime-syntax")
+        view.run_command(
+            "append",
+            {"characters": json.dumps(diagnostics, indent=4, sort_keys=True) + "\n"},
+        )
+        view.set_name("Git Blame Diagnostics")
+        view.set_read_only(True)
+
+    # Overrides end --------------------------------------------------------------------
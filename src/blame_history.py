@@ -0,0 +1,107 @@
+import os
+
+import sublime
+import sublime_plugin
+
+from .base import BaseEngineCommand, NotTrackedError
+
+
+class BlameFileHistory(BaseEngineCommand, sublime_plugin.TextCommand):
+
+    PAGE_SIZE = 100
+    # Start reading the next page once the highlighted entry is this close to the end
+    # of what has been read so far, so that it's ready by the time it's asked for.
+    READ_AHEAD_MARGIN = 20
+
+    # Overrides (TextCommand) ----------------------------------------------------------
+
+    def __init__(self, view):
+        super().__init__(view)
+        self.pager = None
+        self.shown_count = 0
+
+    def run(self, edit):
+        if not self.has_suitable_view():
+            self.tell_user_to_save()
+            return
+
+        path = self.view.file_name()
+        if not self.blame_engine().is_tracked(path):
+            self.communicate_error(NotTrackedError(path))
+            return
+
+        self.close_pager()
+        try:
+            self.pager = self.blame_engine().log_pager(path)
+        except OSError as e:
+            self.communicate_error(e)
+            return
+        pager = self.pager
+        sublime.set_timeout_async(lambda: self.show_page(pager, 0), 0)
+
+    # Overrides (BaseEngineCommand) ----------------------------------------------------
+
+    def _view(self):
+        return self.view
+
+    # Overrides end --------------------------------------------------------------------
+
+    def show_page(self, pager, selected_index):
+        # Runs off the main thread, as git might take a while to find enough commits.
+        count = pager.load(selected_index + self.PAGE_SIZE)
+        if pager is not self.pager:
+            return
+        if count == 0:
+            pager.close()
+            self.communicate_error(
+                "No history found for {0}\n\n{1}".format(
+                    os.path.basename(self.view.file_name()),
+                    "".join(pager.other_output),
+                )
+            )
+            return
+        sublime.set_timeout(lambda: self.show_panel(pager, selected_index), 0)
+
+    def show_panel(self, pager, selected_index):
+        entries = pager.entries[:]
+        self.shown_count = len(entries)
+        items = [
+            [
+                entry.subject,
+                "{0}  {1}  {2}".format(entry.short_sha, entry.date, entry.author),
+            ]
+            for entry in entries
+        ]
+        if not pager.exhausted:
+            # The quick panel doesn't tell us what's typed into its filter, so looking
+            # for something in older history has to be asked for explicitly.
+            items.append(["Load more commits…", "Search older history"])
+        window = self.view.window()
+        if window is None:
+            return
+        window.show_quick_panel(
+            items,
+            lambda index: self.on_select(pager, index),
+            selected_index=selected_index,
+            on_highlight=lambda index: self.on_highlight(pager, index),
+        )
+
+    def on_select(self, pager, index):
+        if index < 0:
+            self.close_pager()
+        elif index == self.shown_count:
+            sublime.set_timeout_async(lambda: self.show_page(pager, index), 0)
+        else:
+            sha = pager.entries[index].sha
+            self.close_pager()
+            self.show_commit(sha)
+
+    def on_highlight(self, pager, index):
+        if not pager.exhausted and index >= self.shown_count - self.READ_AHEAD_MARGIN:
+            target = self.shown_count + self.PAGE_SIZE
+            sublime.set_timeout_async(lambda: pager.load(target), 0)
+
+    def close_pager(self):
+        if self.pager:
+            self.pager.close()
+            self.pager = None
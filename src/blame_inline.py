@@ -1,19 +1,27 @@
+import subprocess
 import threading
+from html import escape
 
 import sublime
 import sublime_plugin
 
-from .base import BaseBlame
+from .base import BaseBlame, HistoryNotLocalError
 from .settings import (
     PKG_SETTINGS_KEY_INLINE_BLAME_DELAY,
     PKG_SETTINGS_KEY_INLINE_BLAME_ENABLED,
     pkg_settings,
 )
-from .templates import blame_inline_phantom_css, blame_inline_phantom_html_template
+from .templates import (
+    blame_inline_notice_phantom_html_template,
+    blame_inline_phantom_css,
+    blame_inline_phantom_html_template,
+    depth_bound_marker,
+)
 
 
 class BlameInlineListener(BaseBlame, sublime_plugin.ViewEventListener):
 
+    LATENCY_BUDGET_MODE = "inline"
     pkg_setting_callback_added = False
 
     # Overrides (ViewEventListener) ----------------------------------------------------
@@ -22,9 +30,6 @@ class BlameInlineListener(BaseBlame, sublime_plugin.ViewEventListener):
         super().__init__(view)
         self.phantom_set = sublime.PhantomSet(view, self.phantom_set_key())
         self.timer = None
-        self.delay_seconds = (
-            pkg_settings().get(PKG_SETTINGS_KEY_INLINE_BLAME_DELAY) / 1000
-        )
         # Show it immediately for the initially selected line.
         self.show_inline_blame()
 
@@ -60,11 +65,17 @@ class BlameInlineListener(BaseBlame, sublime_plugin.ViewEventListener):
 
     def close_by_user_request(self):
         self.view.erase_phantoms(self.phantom_set_key())
+        self.account_phantoms([])
+        self.cancel_prefetch()
 
     def rerun(self, **kwargs):
         if self.timer:
             self.timer.cancel()
-        self.timer = threading.Timer(self.delay_seconds, self.show_inline_blame)
+        delay_ms = self.choose_delay_ms()
+        if delay_ms <= 0:
+            self.show_inline_blame()
+            return
+        self.timer = threading.Timer(delay_ms / 1000, self.show_inline_blame)
         self.timer.start()
 
     # Overrides end --------------------------------------------------------------------
@@ -101,6 +112,18 @@ class BlameInlineListener(BaseBlame, sublime_plugin.ViewEventListener):
             view.settings().set(cls.__name__, "")
             view.settings().erase(cls.__name__)
 
+    def choose_delay_ms(self):
+        path = self.view.file_name()
+        if not path:
+            return pkg_settings().get(PKG_SETTINGS_KEY_INLINE_BLAME_DELAY)
+
+        caret_line_cli_args = None
+        sels = self.view.sel()
+        if len(sels) == 1 and not self.view.is_dirty():
+            _, caret_line_num = self.calculate_positions(sels[0])
+            caret_line_cli_args = self.extra_cli_args(caret_line_num)
+        return self.blame_engine().inline_blame_delay_ms(path, caret_line_cli_args)
+
     def show_inline_blame(self):
         if self.view.is_dirty():
             # If there have already been unsaved edits, stop the git child process from being ran at all.
@@ -120,20 +143,35 @@ class BlameInlineListener(BaseBlame, sublime_plugin.ViewEventListener):
             return
 
         try:
-            blame_output = self.get_blame_text(
-                self.view.file_name(), line_num=caret_line_num
+            blame_output = self.blame_engine().get_inline_blame_text(
+                self.view.file_name(), self.extra_cli_args(caret_line_num)
             )
+        except subprocess.TimeoutExpired:
+            self.show_inline_notice(phantom_pos, "Git blame timed out")
+            return
+        except HistoryNotLocalError:
+            self.show_inline_notice(phantom_pos, "History not available locally")
+            return
         except Exception:  # Don't want to spam Console on failures.
             return
 
         blame = self.parse_line_with_relative_date(blame_output)
         if not blame or blame["sha"] == "00000000":  # All zeros means uncommited change
             return
+        if self.is_beyond_depth_bound(blame):
+            self.show_inline_notice(
+                phantom_pos,
+                escape(depth_bound_marker.format(bound=self.depth_bound_description())),
+            )
+            return
 
         try:
             summary = self.get_commit_message_subject(
                 blame["sha"], self.view.file_name()
             )
+        except subprocess.TimeoutExpired:
+            # The blame itself is still worth showing.
+            summary = ""
         except Exception:  # Don't want to spam Console on failures.
             return
 
@@ -153,7 +191,19 @@ class BlameInlineListener(BaseBlame, sublime_plugin.ViewEventListener):
         phantoms.append(phantom)
 
         # Dispatch back onto the main thread to serialize a final is_dirty check.
-        sublime.set_timeout(lambda: self.maybe_insert_phantoms(phantoms), 0)
+        sublime.set_timeout(
+            lambda: self.maybe_insert_phantoms(phantoms, [blame["sha"]]), 0
+        )
+
+    def show_inline_notice(self, phantom_pos, message):
+        phantom = sublime.Phantom(
+            sublime.Region(phantom_pos),
+            blame_inline_notice_phantom_html_template.format(
+                css=blame_inline_phantom_css, message=message
+            ),
+            sublime.LAYOUT_INLINE,
+        )
+        sublime.set_timeout(lambda: self.maybe_insert_phantoms([phantom], []), 0)
 
     def calculate_positions(self, user_selection):
         selection_goes_backwards = user_selection.a > user_selection.b
@@ -176,9 +226,11 @@ class BlameInlineListener(BaseBlame, sublime_plugin.ViewEventListener):
 
         return (phantom_pos, caret_line_num)
 
-    def maybe_insert_phantoms(self, phantoms):
+    def maybe_insert_phantoms(self, phantoms, shas):
         if not self.view.is_dirty():
             self.phantom_set.update(phantoms)
+            self.account_phantoms(phantoms)
+            self.prefetch_commits(shas)
 
 
 class BlameToggleInline(sublime_plugin.TextCommand):
@@ -7,6 +7,8 @@ from .base import BaseBlame
 
 class BlameInstadiff(BaseBlame, sublime_plugin.TextCommand):
 
+    LATENCY_BUDGET_MODE = "instadiff"
+
     # Overrides (TextCommand) ----------------------------------------------------------
 
     def run(self, edit):
@@ -32,6 +34,17 @@ class BlameInstadiff(BaseBlame, sublime_plugin.TextCommand):
             return
 
         blame = self.parse_line(blame_output)
+        if blame and self.is_beyond_depth_bound(blame):
+            # The boundary commit isn't what last changed the line, so it's worth the
+            # cost of looking further back in this case.
+            try:
+                blame_output = self.get_blame_text(
+                    self.view.file_name(), line_num=line_num, unbounded=True
+                )
+            except Exception as e:
+                self.communicate_error(e)
+                return
+            blame = self.parse_line(blame_output)
         if not blame:
             self.communicate_error(
                 "Failed to parse anything for {0}. Has git's output format changed?".format(
@@ -0,0 +1,83 @@
+import time
+
+import sublime
+import sublime_plugin
+
+from . import commit_graph
+from .base import BaseEngineCommand
+from .repo import find_repo
+
+
+class BlameOptimiseRepository(BaseEngineCommand, sublime_plugin.TextCommand):
+
+    BENCHMARK_RUNS = 3
+
+    # Overrides (TextCommand) ----------------------------------------------------------
+
+    def run(self, edit):
+        if not self.has_suitable_view():
+            self.tell_user_to_save()
+            return
+
+        path = self.view.file_name()
+        repo = find_repo(path)
+        if repo is None:
+            self.communicate_error("{0} is not in a git repository".format(path))
+            return
+
+        status = commit_graph.inspect(repo.common_dir)
+        description = commit_graph.STATUS_DESCRIPTIONS[status]
+        if status == commit_graph.STATUS_OK:
+            sublime.message_dialog(
+                "Git blame:\n\nThis repository already {0}.".format(description)
+            )
+            return
+
+        if not sublime.ok_cancel_dialog(
+            "Git blame:\n\nThis repository {0}.\n\n"
+            "Write one now (in the background)? The time taken to blame this file "
+            "will be measured before and after.\n\n"
+            "This is the same as running:\n\ngit {1}".format(
+                description, " ".join(commit_graph.WRITE_CLI_ARGS)
+            ),
+            "Optimise",
+        ):
+            return
+
+        sublime.set_timeout_async(lambda: self.optimise(path), 0)
+
+    # Overrides (BaseEngineCommand) ----------------------------------------------------
+
+    def _view(self):
+        return self.view
+
+    # Overrides end --------------------------------------------------------------------
+
+    def optimise(self, path):
+        try:
+            sublime.status_message("Git blame: Measuring blame speed...")
+            before_seconds = self.benchmark_blame(path)
+            sublime.status_message("Git blame: Writing commit-graph...")
+            self.run_git(path, commit_graph.WRITE_CLI_ARGS)
+            sublime.status_message("Git blame: Measuring blame speed again...")
+            after_seconds = self.benchmark_blame(path)
+        except Exception as e:
+            self.communicate_error(e)
+            return
+
+        sublime.message_dialog(
+            "Git blame:\n\nThe commit-graph was written.\n\n"
+            "Blaming {0} took {1:.0f} ms before, and now takes {2:.0f} ms.".format(
+                self.view.file_name(), before_seconds * 1000, after_seconds * 1000
+            )
+        )
+
+    def benchmark_blame(self, path):
+        """The median time taken to blame the whole file, bypassing any caching."""
+        cli_args = self.blame_engine().blame_cli_args(path, [])
+        timings = []
+        for _ in range(self.BENCHMARK_RUNS):
+            started_at = time.time()
+            self.run_git(path, cli_args)
+            timings.append(time.time() - started_at)
+        return sorted(timings)[len(timings) // 2]
@@ -0,0 +1,148 @@
+import sys
+import threading
+from collections import OrderedDict
+
+# NOTE: Nothing in this module may import `sublime`, so that it can be exercised
+# outside of the editor.
+
+DEFAULT_BUDGET_BYTES = 64 * 1024 * 1024
+
+
+def estimate_size(value):
+    """Approximate number of bytes that a cached value keeps alive."""
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            estimate_size(k) + estimate_size(v) for k, v in value.items()
+        )
+    return sys.getsizeof(value)
+
+
+class _Entry:
+    __slots__ = ("value", "size", "view_id", "on_evict")
+
+    def __init__(self, value, size, view_id, on_evict):
+        self.value = value
+        self.size = size
+        self.view_id = view_id
+        self.on_evict = on_evict
+
+
+class BlameCache:
+    """
+    A package-wide, memory-bounded LRU store for blame tables, commit metadata and the
+    sizes of rendered phantom HTML.
+
+    Entries can be owned by a view (identified by its id) so that they are freed the
+    moment that view is closed. Entries without an owner (e.g. the text of a commit,
+    which is immutable and useful to every view in the same repo) only go away via
+    eviction. When over budget, entries belonging to views other than the active one
+    are evicted first, least recently used first.
+    """
+
+    def __init__(self, budget_bytes=DEFAULT_BUDGET_BYTES):
+        self.budget_bytes = budget_bytes
+        self.active_view_id = None
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # type: OrderedDict[object, _Entry]
+        self._keys_by_view = {}  # type: dict[int, set] # type: ignore[misc]
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry.value
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def put(self, key, value, view_id=None, size=None, on_evict=None):
+        if size is None:
+            size = estimate_size(value)
+        evicted = []
+        with self._lock:
+            self._remove(key)
+            if size > self.budget_bytes:
+                # Storing it would just flush everything else out.
+                return
+            self._entries[key] = _Entry(value, size, view_id, on_evict)
+            self.total_bytes += size
+            if view_id is not None:
+                self._keys_by_view.setdefault(view_id, set()).add(key)
+            while self.total_bytes > self.budget_bytes:
+                victim_key = self._pick_victim()
+                evicted.append(self._remove(victim_key))
+                self.evictions += 1
+        # Callbacks are ran outside of the lock because they may well re-enter.
+        for entry in evicted:
+            if entry and entry.on_evict:
+                entry.on_evict()
+
+    def discard(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def release_view(self, view_id):
+        """Immediately free everything owned by a view, e.g. because it was closed."""
+        with self._lock:
+            for key in list(self._keys_by_view.get(view_id, ())):
+                self._remove(key)
+            self._keys_by_view.pop(view_id, None)
+            if self.active_view_id == view_id:
+                self.active_view_id = None
+
+    def set_active_view(self, view_id):
+        self.active_view_id = view_id
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "views": len(self._keys_by_view),
+                "total_bytes": self.total_bytes,
+                "budget_bytes": self.budget_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_view.clear()
+            self.total_bytes = 0
+
+    # ------------------------------------------------------------
+
+    def _pick_victim(self):
+        # Iteration order of the OrderedDict is least to most recently used.
+        for key, entry in self._entries.items():
+            if entry.view_id is None or entry.view_id != self.active_view_id:
+                return key
+        return next(iter(self._entries))
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return None
+        self.total_bytes -= entry.size
+        if entry.view_id is not None:
+            view_keys = self._keys_by_view.get(entry.view_id)
+            if view_keys is not None:
+                view_keys.discard(key)
+                if not view_keys:
+                    del self._keys_by_view[entry.view_id]
+        return entry
+
+
+blame_cache = BlameCache()
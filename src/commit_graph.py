@@ -0,0 +1,94 @@
+import glob
+import os
+import struct
+
+# NOTE: Nothing in this module may import `sublime`, so that it can be exercised
+# outside of the editor.
+
+# REF: https://git-scm.com/docs/gitformat-commit-graph
+SIGNATURE = b"CGPH"
+CHUNK_ID_BLOOM_INDEXES = b"BIDX"
+CHUNK_ID_BLOOM_DATA = b"BDAT"
+
+STATUS_OK = "ok"
+STATUS_MISSING = "missing"
+STATUS_NO_BLOOM_FILTERS = "no-bloom-filters"
+STATUS_STALE = "stale"
+
+STATUS_DESCRIPTIONS = {
+    STATUS_OK: "has an up-to-date commit-graph with changed-path Bloom filters",
+    STATUS_MISSING: "has no commit-graph",
+    STATUS_NO_BLOOM_FILTERS: "has a commit-graph without changed-path Bloom filters",
+    STATUS_STALE: "has a commit-graph that is older than some of its history",
+}
+
+# Repos smaller than this are fast enough to blame regardless, so aren't worth
+# bothering the user about.
+ADVICE_MIN_PACK_BYTES = 20 * 1024 * 1024
+
+WRITE_CLI_ARGS = ["commit-graph", "write", "--reachable", "--changed-paths"]
+
+
+def graph_files(objects_dir):
+    """The commit-graph file(s) of a repo, which may be a single file or a chain."""
+    info_dir = os.path.join(objects_dir, "info")
+    single = os.path.join(info_dir, "commit-graph")
+    if os.path.isfile(single):
+        return [single]
+    chain_dir = os.path.join(info_dir, "commit-graphs")
+    try:
+        with open(os.path.join(chain_dir, "commit-graph-chain"), encoding="ascii") as f:
+            hashes = [line.strip() for line in f if line.strip()]
+    except OSError:
+        return []
+    return [os.path.join(chain_dir, "graph-{0}.graph".format(h)) for h in hashes]
+
+
+def read_chunk_ids(graph_file):
+    """The IDs of the chunks present in a commit-graph file, or None if unreadable."""
+    try:
+        with open(graph_file, "rb") as f:
+            header = f.read(8)
+            if len(header) != 8 or header[:4] != SIGNATURE:
+                return None
+            num_chunks = header[6]
+            # The table of contents has a terminating entry after the real ones.
+            toc = f.read(12 * (num_chunks + 1))
+    except OSError:
+        return None
+    if len(toc) != 12 * (num_chunks + 1):
+        return None
+    return {struct.unpack_from(">4s", toc, 12 * i)[0] for i in range(num_chunks)}
+
+
+def pack_files(objects_dir):
+    return glob.glob(os.path.join(objects_dir, "pack", "*.pack"))
+
+
+def inspect(common_dir):
+    """Work out whether git will be able to blame quickly in the given repo."""
+    objects_dir = os.path.join(common_dir, "objects")
+    graphs = graph_files(objects_dir)
+    if not graphs:
+        return STATUS_MISSING
+    for graph in graphs:
+        chunk_ids = read_chunk_ids(graph)
+        if chunk_ids is None:
+            return STATUS_MISSING
+        if not {CHUNK_ID_BLOOM_INDEXES, CHUNK_ID_BLOOM_DATA} <= chunk_ids:
+            return STATUS_NO_BLOOM_FILTERS
+    # New history normally arrives in new packs (fetch, gc, repack), so a graph that's
+    # older than the newest pack is likely to be missing a good number of commits.
+    newest_graph = max(os.path.getmtime(g) for g in graphs)
+    newest_pack = max([os.path.getmtime(p) for p in pack_files(objects_dir)] or [0])
+    if newest_pack > newest_graph:
+        return STATUS_STALE
+    return STATUS_OK
+
+
+def worth_advising(common_dir):
+    objects_dir = os.path.join(common_dir, "objects")
+    total_pack_bytes = sum(os.path.getsize(p) for p in pack_files(objects_dir))
+    return (
+        total_pack_bytes >= ADVICE_MIN_PACK_BYTES and inspect(common_dir) != STATUS_OK
+    )
@@ -0,0 +1,579 @@
+import os
+import re
+import subprocess
+import sys
+import time
+
+from . import commit_graph, helper, tracked
+from .cache import blame_cache, estimate_size
+from .history import LOG_CLI_ARGS, LogPager
+from .latency import inline_blame_latency
+from .prefetch import commit_prefetcher
+from .repo import file_state, find_repo, is_partial_clone, repo_key
+from .settings import (
+    PKG_SETTINGS_KEY_BLAME_SINCE,
+    PKG_SETTINGS_KEY_BLAME_SINCE_REVISION,
+    PKG_SETTINGS_KEY_CACHE_BUDGET_MB,
+    PKG_SETTINGS_KEY_CUSTOMBLAMEFLAGS,
+    PKG_SETTINGS_KEY_HELPER_ENABLED,
+    PKG_SETTINGS_KEY_HELPER_IDLE_TIMEOUT,
+    PKG_SETTINGS_KEY_HELPER_PYTHON,
+    PKG_SETTINGS_KEY_INLINE_BLAME_ADAPTIVE_DELAY,
+    PKG_SETTINGS_KEY_INLINE_BLAME_DELAY,
+    PKG_SETTINGS_KEY_INLINE_BLAME_DELAY_MAX,
+    PKG_SETTINGS_KEY_LATENCY_BUDGETS,
+    PKG_SETTINGS_KEY_PREFETCH_ENABLED,
+    PKG_SETTINGS_KEY_PREFETCH_MAX_KB,
+    PKG_SETTINGS_KEY_REPO_ADVICE_ENABLED,
+)
+from .singleflight import git_single_flight
+
+# NOTE: Nothing in this module may import `sublime`, so that it can be exercised
+# outside of the editor (see headless.py).
+
+# After failing to reach or start the helper process, don't keep trying (and stalling)
+# on every git invocation.
+HELPER_RETRY_INTERVAL_SECONDS = 60
+helper_unavailable_until = 0.0
+
+# Repos (identified by their common git dir) that have already been checked for
+# whether they could be made faster to blame. Only worth doing once per session.
+repos_checked_for_acceleration = set()  # type: set[str] # type: ignore[misc]
+
+# Files for which blaming with the expensive flags went over the latency budget. From
+# then on, they're blamed without those flags.
+paths_too_slow_for_expensive_blame = set()  # type: set[str] # type: ignore[misc]
+
+# Honoured by git 2.44+, and by older maintenance releases it was backported to (e.g.
+# 2.39.4). Stops git from fetching objects that are missing from a partial clone,
+# which can turn a blame into minutes of network traffic (or a hang when offline).
+GIT_NO_LAZY_FETCH_ENV_VAR = "GIT_NO_LAZY_FETCH"
+MISSING_OBJECTS_OUTPUT_MARKERS = (
+    "lazy fetching disabled",
+    "unable to read",
+    "missing blob object",
+    "could not fetch",
+)
+
+# Repos (identified by their git dir) where listing the tracked files failed or took
+# too long, along with the index_token() at the time. Until the index changes, every
+# file in them is assumed to be tracked.
+repos_without_tracked_index = {}  # type: dict[str, object] # type: ignore[misc]
+
+# The paths that are tracked in each repo (identified by its git dir), along with the
+# index_token() they were listed at. Deliberately not kept in the budgeted cache: in a
+# big repo, the set could be bigger than the whole budget, and evicting it would mean
+# listing every file in the repo again before each blame.
+tracked_paths_by_repo = {}  # type: dict[str, tuple] # type: ignore[misc]
+
+# Commits that turned out to be bigger than the whole prefetch cap, keyed by repo.
+# Prefetching them again would only mean running git for nothing every time the
+# caret lands on one of their lines.
+commits_too_big_to_prefetch = {}  # type: dict[str, set[str]] # type: ignore[misc]
+
+# Commits that couldn't be shown because their objects are missing from a partial
+# clone, keyed by repo. They'll be fetched by BlameFetchMissingHistory.
+shas_missing_locally = {}  # type: dict[str, set[str]] # type: ignore[misc]
+
+
+class HistoryNotLocalError(subprocess.CalledProcessError):
+    def __str__(self):
+        return (
+            "The history needed for this is not available locally, because this "
+            "repository is a partial clone.\n\n"
+            "Run 'Git Blame: Fetch Missing History' to download it."
+        )
+
+
+class NotTrackedError(Exception):
+    def __init__(self, path):
+        super().__init__(path)
+        self.path = path
+
+    def __str__(self):
+        return "{0} is not tracked by git, so there is no blame for it.".format(
+            os.path.basename(self.path)
+        )
+
+
+def tracked_index_stats():
+    memos = list(tracked_paths_by_repo.values())
+    return {
+        "repos": len(memos),
+        "paths": sum(len(paths) for _, paths in memos),
+        "bytes": sum(tracked.size_of(paths) for _, paths in memos),
+        "repos_without": len(repos_without_tracked_index),
+    }
+
+
+def git_startupinfo():
+    if sys.platform != "win32":
+        return None
+    startup_info = subprocess.STARTUPINFO()
+    # Stop a visible console window from appearing.
+    startup_info.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+    startup_info.wShowWindow = subprocess.SW_HIDE
+    return startup_info
+
+
+def commit_fulltext_cli_args(sha):
+    return ["show", "--no-color", sha]
+
+
+def commit_subject_cli_args(sha):
+    return ["show", "--no-color", sha, "--pretty=format:%s", "--no-patch"]
+
+
+def parse_line(line):
+    pattern = r"""(?x)
+        ^   (?P<sha>\^?\w+)
+        \s+ (?P<file>[\S ]+)
+        \s+
+        \(  (?P<author>.+?)
+        \s+ (?P<date>\d{4}-\d{2}-\d{2})
+        \s+ (?P<time>\d{2}:\d{2}:\d{2})
+        \s+ (?P<timezone>[\+-]\d+)
+        \s+ (?P<line_number>\d+)
+        \)
+        \s
+        """
+    # re's module-level functions like match(...) internally cache the compiled form of pattern strings.
+    m = re.match(pattern, line)
+    return postprocess_parse_result(m)
+
+
+# @todo Add a test for the `parse_line_with_relative_date` function in test_parsing.py
+def parse_line_with_relative_date(line):
+    """
+    The difference from parse_line is that date/time/timezone are replaced with relative_date
+    to be able to parse human readable format
+    https://github.com/git/git/blob/c09b6306c6ca275ed9d0348a8c8014b2ff723cfb/date.c#L131
+    """
+    pattern = r"""(?x)
+        ^   (?P<sha>\^?\w+)
+        \s+ (?P<file>[\S ]+)
+        \s+
+        \(  (?P<author>.+?)
+        \s+ (?P<relative_date>\d+.+ago)
+        \s+ (?P<line_number>\d+)
+        \)
+        \s
+        """
+    # re's module-level functions like match(...) internally cache the compiled form of pattern strings.
+    m = re.match(pattern, line)
+    return postprocess_parse_result(m)
+
+
+def postprocess_parse_result(match):
+    if match:
+        d = match.groupdict()
+        # The SHA output by `git blame` may have a leading caret to indicate that it
+        # is a "boundary commit". That needs to be stripped before passing the SHA
+        # back to git CLI commands for other purposes.
+        d["sha_normalised"] = d["sha"].strip("^")
+        return d
+    else:
+        return {}
+
+
+class BlameEngine:
+    """
+    Runs git, caches its output and schedules prefetches on behalf of whatever is
+    showing blame information, be that an editor command or headless.py.
+
+    `settings` is anything with a `get(key, default=None)` method that has the
+    package's settings in it. `latency_budget_mode` says which entry of the latency
+    budgets setting applies to the git processes this engine runs (None means they
+    are allowed to take as long as they take). Blame output is cached on behalf of
+    `owner_id` (e.g. a view id), if given. `notify` is called with messages that the
+    user would want to know about, but that don't warrant interrupting them.
+    """
+
+    def __init__(self, settings, latency_budget_mode=None, owner_id=None, notify=None):
+        self.settings = settings
+        self.latency_budget_mode = latency_budget_mode
+        self.owner_id = owner_id
+        self.notify = notify or (lambda msg: print(msg, file=sys.stderr))  # noqa: T201
+
+    def cache(self):
+        # The budget is re-read every time so that changes to the setting take effect
+        # without a restart.
+        blame_cache.budget_bytes = int(
+            self.settings.get(PKG_SETTINGS_KEY_CACHE_BUDGET_MB) * 1024 * 1024
+        )
+        return blame_cache
+
+    # Running git ----------------------------------------------------------------------
+
+    def run_git(self, path, cli_args, cache_key=None, allow_lazy_fetch=False):
+        cwd = os.path.dirname(os.path.realpath(path))
+        self.check_repo_acceleration(path)
+        timeout = self.latency_budget_seconds()
+
+        extra_env = {} if allow_lazy_fetch else self.lazy_fetch_guard_env(path)
+        guard_lazy_fetch = bool(extra_env)
+
+        # Identical requests often overlap, e.g. from clones of the same view, or inline
+        # blame firing during Show All. Only one git process is needed for them. Each
+        # latency budget gets its own process though, as a caller that may wait longer
+        # mustn't inherit the timeout of one that may not.
+        flight_key = (
+            cwd,
+            tuple(cli_args),
+            tuple(sorted(extra_env.items())),
+            file_state(path),
+            timeout,
+        )
+        try:
+            return git_single_flight.run(
+                flight_key,
+                lambda: self.run_git_process(
+                    cwd, cli_args, cache_key, timeout, extra_env
+                ),
+                label=cli_args[0],
+            )
+        except subprocess.CalledProcessError as e:
+            output = e.output.decode(errors="replace")
+            if guard_lazy_fetch and any(
+                marker in output for marker in MISSING_OBJECTS_OUTPUT_MARKERS
+            ):
+                raise HistoryNotLocalError(e.returncode, e.cmd, e.output)
+            raise
+
+    def run_git_process(self, cwd, cli_args, cache_key, timeout, extra_env):
+        global helper_unavailable_until
+
+        try:
+            client = self.helper_client()
+            if client:
+                return client.run_git(cwd, cli_args, cache_key, timeout, extra_env)
+        except helper.HelperUnavailable as e:
+            msg = "Git blame: Running git directly. Helper process unavailable: {0}"
+            print(msg.format(e))  # noqa: T201
+            helper_unavailable_until = time.time() + HELPER_RETRY_INTERVAL_SECONDS
+
+        cmd_line = ["git"] + cli_args
+        # print(cmd_line)
+
+        return subprocess.check_output(
+            cmd_line,
+            cwd=cwd,
+            env=dict(os.environ, **extra_env) if extra_env else None,
+            startupinfo=git_startupinfo(),
+            stderr=subprocess.STDOUT,
+            # The process is killed if it's still running after this.
+            timeout=timeout,
+        ).decode()
+
+    def helper_client(self):
+        """Returns a client for the helper process, or None if it's not to be used."""
+        if not self.settings.get(PKG_SETTINGS_KEY_HELPER_ENABLED):
+            return None
+        if not helper.is_supported():
+            return None
+        if time.time() < helper_unavailable_until:
+            return None
+        return helper.HelperClient(
+            helper.default_socket_path(),
+            self.settings.get(PKG_SETTINGS_KEY_HELPER_PYTHON),
+            self.settings.get(PKG_SETTINGS_KEY_HELPER_IDLE_TIMEOUT),
+            self.settings.get(PKG_SETTINGS_KEY_CACHE_BUDGET_MB),
+        )
+
+    def lazy_fetch_guard_env(self, path):
+        """The environment variables for git that stop it lazily fetching, if any."""
+        repo = find_repo(path)
+        if repo is None or not is_partial_clone(repo):
+            return {}
+        return {GIT_NO_LAZY_FETCH_ENV_VAR: "1"}
+
+    def latency_budget_seconds(self):
+        if self.latency_budget_mode is None:
+            return None
+        budgets = self.settings.get(PKG_SETTINGS_KEY_LATENCY_BUDGETS) or {}
+        budget_ms = budgets.get(self.latency_budget_mode)
+        return budget_ms / 1000 if budget_ms else None
+
+    def check_repo_acceleration(self, path):
+        """
+        Suggest the Optimise Repository command if git is going to be needlessly slow
+        at blaming in this repo. This only looks at files in the git dir.
+        """
+        if not self.settings.get(PKG_SETTINGS_KEY_REPO_ADVICE_ENABLED):
+            return
+        repo = find_repo(path)
+        if repo is None or repo.common_dir in repos_checked_for_acceleration:
+            return
+        repos_checked_for_acceleration.add(repo.common_dir)
+        if commit_graph.worth_advising(repo.common_dir):
+            self.notify(
+                "Git blame: This repository {0}. Blame may be much faster after "
+                "running 'Git Blame: Optimise Repository'.".format(
+                    commit_graph.STATUS_DESCRIPTIONS[
+                        commit_graph.inspect(repo.common_dir)
+                    ]
+                )
+            )
+
+    # Blame ----------------------------------------------------------------------------
+
+    def blame_cli_args(self, path, extra_cli_args, unbounded=False):
+        expensive = os.path.realpath(path) not in paths_too_slow_for_expensive_blame
+        cli_args = ["blame", "--show-name"]
+        if expensive:
+            cli_args.append("--minimal")
+        cli_args.append("-w")
+        cli_args.extend(extra_cli_args)
+        if expensive:
+            cli_args.extend(self.settings.get(PKG_SETTINGS_KEY_CUSTOMBLAMEFLAGS, []))
+        if not unbounded:
+            cli_args.extend(self.depth_bound_cli_args())
+        cli_args.extend(["--", os.path.basename(path)])
+        return cli_args
+
+    def depth_bound_cli_args(self):
+        """
+        Stop git from walking history beyond the user's configured bound. Lines that
+        were last changed before it get attributed to a "boundary commit" instead.
+        """
+        args = []
+        since = self.settings.get(PKG_SETTINGS_KEY_BLAME_SINCE)
+        if since:
+            args.append("--since={0}".format(since))
+        since_revision = self.since_revision()
+        if since_revision:
+            # Only excludes history. Given a range ending in a commit, git would blame
+            # the file as of that commit rather than as it is in the working tree.
+            args.append("^{0}".format(since_revision))
+        if args:
+            # Otherwise git marks root commits as boundaries too, and lines from them
+            # would be indistinguishable from those from before the bound.
+            args.insert(0, "--root")
+        return args
+
+    def since_revision(self):
+        since_revision = self.settings.get(PKG_SETTINGS_KEY_BLAME_SINCE_REVISION)
+        if since_revision and ".." in since_revision:
+            self.notify(
+                "Git blame: Ignoring the {0} setting, because it's a range rather than "
+                "a single revision".format(PKG_SETTINGS_KEY_BLAME_SINCE_REVISION)
+            )
+            return None
+        return since_revision
+
+    def depth_bound_description(self):
+        since = self.settings.get(PKG_SETTINGS_KEY_BLAME_SINCE)
+        return " and ".join(d for d in (since, self.since_revision()) if d)
+
+    def is_beyond_depth_bound(self, blame, unbounded=False):
+        # With a bound, git is told not to mark root commits as boundaries (see
+        # depth_bound_cli_args), so the marker only means that the bound was reached.
+        return (
+            not unbounded
+            and bool(self.depth_bound_cli_args())
+            and blame["sha"].startswith("^")
+        )
+
+    def blame_cache_key(self, path, cli_args):
+        # The blame of a file can only change if the file or the repo's index/HEAD
+        # changes, so that is what the cached result is tied to.
+        state = file_state(path)
+        if state is None:
+            return None
+        return ("blame", os.path.realpath(path), tuple(cli_args), state)
+
+    def is_blame_cached(self, path, extra_cli_args, unbounded=False):
+        cache_key = self.blame_cache_key(
+            path, self.blame_cli_args(path, extra_cli_args, unbounded)
+        )
+        return cache_key is not None and cache_key in self.cache()
+
+    def get_blame_text(self, path, extra_cli_args, unbounded=False):
+        if not self.is_tracked(path):
+            raise NotTrackedError(path)
+        cli_args = self.blame_cli_args(path, extra_cli_args, unbounded)
+        try:
+            return self.run_blame(path, cli_args)
+        except subprocess.TimeoutExpired:
+            # Degrade to a cheaper blame (that's less clever about detecting moved
+            # lines etc.) rather than not having any result at all.
+            real_path = os.path.realpath(path)
+            newly_too_slow = real_path not in paths_too_slow_for_expensive_blame
+            paths_too_slow_for_expensive_blame.add(real_path)
+            cheap_cli_args = self.blame_cli_args(path, extra_cli_args, unbounded)
+            # When the expensive blame was shared by several callers (see run_git),
+            # they all time out together, and all but the first will find the path
+            # already degraded. They still deserve their cheap retry.
+            if cheap_cli_args == cli_args:
+                raise
+            blame_text = self.run_blame(path, cheap_cli_args)
+            if newly_too_slow:
+                self.notify(
+                    "Git blame: Blaming {0} took too long, so it's now being done "
+                    "without --minimal or custom_blame_flags".format(
+                        os.path.basename(path)
+                    )
+                )
+            return blame_text
+
+    def is_tracked(self, path):
+        """
+        Whether git has the file in its index, answered from a per-repo list of
+        tracked files rather than by running git. If in doubt, says it is.
+        """
+        repo = find_repo(path)
+        if repo is None:
+            return True
+        token = tracked.index_token(repo)
+        if repos_without_tracked_index.get(repo.git_dir, False) == token:
+            return True
+
+        memo = tracked_paths_by_repo.get(repo.git_dir)
+        if memo is not None and memo[0] == token:
+            tracked_paths = memo[1]
+        else:
+            try:
+                output = self.run_git(path, tracked.LS_FILES_CLI_ARGS)
+                tracked_paths = tracked.parse_ls_files(output)
+            except (
+                subprocess.CalledProcessError,
+                subprocess.TimeoutExpired,
+                MemoryError,
+            ):
+                tracked_paths_by_repo.pop(repo.git_dir, None)
+                repos_without_tracked_index[repo.git_dir] = token
+                return True
+            tracked_paths_by_repo[repo.git_dir] = (token, tracked_paths)
+        return tracked.relative_path(repo, path) in tracked_paths
+
+    def run_blame(self, path, cli_args):
+        cache_key = self.blame_cache_key(path, cli_args)
+        if cache_key is None:
+            return self.run_git(path, cli_args)
+        blame_text = self.cache().get(cache_key)
+        if blame_text is None:
+            blame_text = self.run_git(path, cli_args, cache_key)
+            self.cache().put(cache_key, blame_text, view_id=self.owner_id)
+        return blame_text
+
+    # Inline blame ---------------------------------------------------------------------
+
+    def inline_blame_delay_ms(self, path, extra_cli_args=None):
+        """
+        How long inline blame should wait for the caret to settle before blaming the
+        line it's on. `extra_cli_args` are for that line, if it's known which it is.
+        """
+        configured_delay_ms = self.settings.get(PKG_SETTINGS_KEY_INLINE_BLAME_DELAY)
+        if not self.settings.get(PKG_SETTINGS_KEY_INLINE_BLAME_ADAPTIVE_DELAY):
+            return configured_delay_ms
+
+        if extra_cli_args is not None and self.is_blame_cached(path, extra_cli_args):
+            # The answer is already known, so there's nothing to debounce.
+            return 0
+
+        # Debounce for about as long as git takes in this repo, so that it isn't kept
+        # busy with lines the caret is merely passing over. The configured delay is
+        # the floor, as that's what it was before anything was measured.
+        lookup_ms = inline_blame_latency.lookup_ms(repo_key(path))
+        if lookup_ms is None:
+            return configured_delay_ms
+        max_delay_ms = self.settings.get(PKG_SETTINGS_KEY_INLINE_BLAME_DELAY_MAX)
+        return max(min(lookup_ms, max_delay_ms), configured_delay_ms)
+
+    def get_inline_blame_text(self, path, extra_cli_args):
+        """
+        Like get_blame_text(), but also records how long it took, for
+        inline_blame_delay_ms() to go by.
+        """
+        was_cached = self.is_blame_cached(path, extra_cli_args)
+        started_at = time.time()
+
+        def record_latency():
+            inline_blame_latency.record(
+                repo_key(path), (time.time() - started_at) * 1000, was_cached
+            )
+
+        try:
+            blame_text = self.get_blame_text(path, extra_cli_args)
+        except subprocess.TimeoutExpired:
+            record_latency()
+            raise
+        record_latency()
+        return blame_text
+
+    # Commits --------------------------------------------------------------------------
+
+    def get_commit_fulltext(self, sha, path):
+        try:
+            return self.run_git_for_commit(path, commit_fulltext_cli_args(sha))
+        except HistoryNotLocalError:
+            shas_missing_locally.setdefault(repo_key(path), set()).add(sha)
+            raise
+
+    def get_commit_message_subject(self, sha, path):
+        return self.run_git_for_commit(path, commit_subject_cli_args(sha))
+
+    def commit_cache_key(self, path, cli_args):
+        # What a commit consists of never changes, so the output can be shared by every
+        # view onto the same repo, and only goes away if it needs to be evicted.
+        return ("commit", repo_key(path), tuple(cli_args))
+
+    def run_git_for_commit(self, path, cli_args):
+        cache_key = self.commit_cache_key(path, cli_args)
+        output = self.cache().get(cache_key)
+        if output is None:
+            output = self.run_git(path, cli_args, cache_key)
+            self.cache().put(cache_key, output)
+        return output
+
+    def prefetch_commits(self, owner, path, shas):
+        """
+        Fetch the full text of the given commits in the background, on the basis that
+        the user is likely to ask for one of them next. Replaces whatever was
+        previously being prefetched for the owner (see Prefetcher).
+        """
+        commit_prefetcher.cancel(owner)
+        if not self.settings.get(PKG_SETTINGS_KEY_PREFETCH_ENABLED):
+            return
+        commit_prefetcher.max_bytes = (
+            self.settings.get(PKG_SETTINGS_KEY_PREFETCH_MAX_KB) * 1024
+        )
+        too_big = commits_too_big_to_prefetch.get(repo_key(path), set())
+        submitted = set()
+        for sha in shas:
+            cache_key = self.commit_cache_key(path, commit_fulltext_cli_args(sha))
+            if cache_key in submitted or cache_key in self.cache() or sha in too_big:
+                continue
+            submitted.add(cache_key)
+            commit_prefetcher.submit(
+                owner,
+                lambda sha=sha: self.get_commit_fulltext(sha, path),
+                lambda sha=sha, cache_key=cache_key: self.forget_prefetched_commit(
+                    path, sha, cache_key
+                ),
+            )
+
+    def forget_prefetched_commit(self, path, sha, cache_key):
+        """Called when a prefetched commit didn't fit within the prefetch cap."""
+        value = self.cache().get(cache_key)
+        if value is not None and estimate_size(value) > commit_prefetcher.max_bytes:
+            commits_too_big_to_prefetch.setdefault(repo_key(path), set()).add(sha)
+        self.cache().discard(cache_key)
+
+    # History --------------------------------------------------------------------------
+
+    def log_pager(self, path):
+        """
+        Starts `git log` for the file, to be read a page at a time. Unlike with
+        run_git(), the process is neither shared nor ran by the helper process, as its
+        output is read while it's still running. Lazy fetching is guarded against all
+        the same.
+        """
+        self.check_repo_acceleration(path)
+        extra_env = self.lazy_fetch_guard_env(path)
+        return LogPager(
+            ["git"] + LOG_CLI_ARGS + ["--", os.path.basename(path)],
+            cwd=os.path.dirname(os.path.realpath(path)),
+            startupinfo=git_startupinfo(),
+            env=dict(os.environ, **extra_env) if extra_env else None,
+        )
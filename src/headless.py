@@ -0,0 +1,288 @@
+"""
+Runs the blame engine against a real repository without Sublime Text, and prints how
+long each step took. This is for benchmarking and profiling the hot path, e.g. in CI.
+From the package's directory:
+
+    python -m src.headless path/to/file.py
+    python -m src.headless path/to/file.py --lines 1-50 --relative-dates --commits
+    python -m src.headless path/to/file.py --lines 1-50 --inline --history 100
+    python -m src.headless path/to/file.py --repeat 3 --profile
+
+The package's default settings are used, except where overridden with --setting.
+"""
+
+import argparse
+import cProfile
+import json
+import os
+import pstats
+import sys
+import time
+
+from .cache import blame_cache
+from .engine import BlameEngine, parse_line, parse_line_with_relative_date
+from .singleflight import git_single_flight
+
+# NOTE: Nothing in this module may import `sublime`. That's the point of it.
+
+DEFAULT_SETTINGS_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "Settings",
+    "Git blame.sublime-settings",
+)
+
+
+def load_settings(overrides):
+    with open(DEFAULT_SETTINGS_PATH, encoding="utf-8") as f:
+        # The settings file is JSON, apart from having comments.
+        lines = [line for line in f if not line.lstrip().startswith("//")]
+    settings = json.loads("".join(lines))
+    settings.update(overrides)
+    return settings
+
+
+def parse_setting(arg):
+    key, sep, value = arg.partition("=")
+    if not sep:
+        raise argparse.ArgumentTypeError("expected KEY=JSON_VALUE, got " + arg)
+    try:
+        return key, json.loads(value)
+    except ValueError:
+        # Saves having to quote plain strings in the shell.
+        return key, value
+
+
+def parse_line_numbers(arg):
+    """e.g. "1,5,10-20" """
+    line_nums = []
+    for part in arg.split(","):
+        first, _, last = part.partition("-")
+        try:
+            line_nums.extend(range(int(first), int(last or first) + 1))
+        except ValueError:
+            raise argparse.ArgumentTypeError("bad line number(s): " + part)
+    return line_nums
+
+
+class Timings:
+    def __init__(self, operation, path):
+        self.operation = operation
+        self.path = path
+        self.durations_ms = []  # type: list[float] # type: ignore[misc]
+        # How long inline blame would have debounced each query for.
+        self.delays_ms = []  # type: list[float] # type: ignore[misc]
+        self.spawned = 0
+
+    def time(self, fn):
+        started_before = git_single_flight.started
+        started_at = time.perf_counter()
+        result = fn()
+        self.durations_ms.append((time.perf_counter() - started_at) * 1000)
+        self.spawned += git_single_flight.started - started_before
+        return result
+
+    def summary(self):
+        durations_ms = sorted(self.durations_ms)
+        return {
+            "operation": self.operation,
+            "path": self.path,
+            "queries": len(durations_ms),
+            "git_processes": self.spawned,
+            "total_ms": sum(durations_ms),
+            "median_ms": durations_ms[len(durations_ms) // 2] if durations_ms else 0,
+            "max_ms": durations_ms[-1] if durations_ms else 0,
+            "median_delay_ms": (
+                sorted(self.delays_ms)[len(self.delays_ms) // 2]
+                if self.delays_ms
+                else None
+            ),
+        }
+
+
+def blame_file(engine, path, args):
+    """Does what the editor would for the given file, timing each step."""
+    blame_timings = Timings("blame", path)
+    shas = []
+    if args.lines:
+        parse = parse_line_with_relative_date if args.relative_dates else parse_line
+        for line_num in args.lines:
+            extra_cli_args = ["-L", "{0},{0}".format(line_num)]
+            if args.relative_dates:
+                extra_cli_args.append("--date=relative")
+            if args.inline:
+                blame_timings.delays_ms.append(
+                    engine.inline_blame_delay_ms(path, extra_cli_args)
+                )
+                get_blame_text = engine.get_inline_blame_text
+            else:
+                get_blame_text = engine.get_blame_text
+            blame_output = blame_timings.time(
+                lambda: get_blame_text(path, extra_cli_args)
+            )
+            shas.append(parse(blame_output).get("sha_normalised"))
+    else:
+        blame_output = blame_timings.time(lambda: engine.get_blame_text(path, []))
+        shas.extend(
+            parse_line(line).get("sha_normalised") for line in blame_output.splitlines()
+        )
+
+    results = [blame_timings]
+    if args.commits:
+        commit_timings = Timings("commits", path)
+        for sha in sorted({sha for sha in shas if sha and sha.strip("0")}):
+            commit_timings.time(lambda: engine.get_commit_message_subject(sha, path))
+        results.append(commit_timings)
+    if args.history:
+        history_timings = Timings("history", path)
+        pager = engine.log_pager(path)
+        try:
+            history_timings.time(lambda: pager.load(args.history))
+        finally:
+            pager.close()
+        # It doesn't go via run_git(), so isn't counted by time().
+        history_timings.spawned += 1
+        results.append(history_timings)
+    return results
+
+
+def print_table(runs):
+    row = "{0:>4}  {1:<8} {2:>7} {3:>5} {4:>10} {5:>9} {6:>9} {7:>8}  {8}"
+    print(  # noqa: T201
+        row.format(
+            "pass",
+            "op",
+            "queries",
+            "git",
+            "total_ms",
+            "median_ms",
+            "max_ms",
+            "delay_ms",
+            "path",
+        )
+    )
+    for run in runs:
+        print(  # noqa: T201
+            row.format(
+                run["pass"],
+                run["operation"],
+                run["queries"],
+                run["git_processes"],
+                "{0:.1f}".format(run["total_ms"]),
+                "{0:.1f}".format(run["median_ms"]),
+                "{0:.1f}".format(run["max_ms"]),
+                (
+                    "{0:.1f}".format(run["median_delay_ms"])
+                    if run["median_delay_ms"] is not None
+                    else "-"
+                ),
+                run["path"],
+            )
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m src.headless",
+        description="Time the Git blame package's engine against a repository.",
+    )
+    parser.add_argument("paths", nargs="+", metavar="PATH", help="file(s) to blame")
+    parser.add_argument(
+        "--lines",
+        type=parse_line_numbers,
+        help="blame these lines one at a time, like inline blame does, "
+        "rather than the whole file at once (e.g. 1,5,10-20)",
+    )
+    parser.add_argument(
+        "--relative-dates",
+        action="store_true",
+        help="ask for relative dates, like inline blame does",
+    )
+    parser.add_argument(
+        "--inline",
+        action="store_true",
+        help="blame the --lines like inline blame does, with relative dates, and "
+        "note how long it would have waited for the caret to settle on each",
+    )
+    parser.add_argument(
+        "--commits",
+        action="store_true",
+        help="also look up the subject of every commit that was found",
+    )
+    parser.add_argument(
+        "--history",
+        type=int,
+        metavar="N",
+        help="also read the newest N commits of the file's history, like the File "
+        "History command does",
+    )
+    parser.add_argument(
+        "--mode",
+        help="which entry of the latency_budgets_ms setting applies to git processes",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=1,
+        help="number of passes. Later passes show the effect of caching",
+    )
+    parser.add_argument(
+        "--cold", action="store_true", help="clear the cache before every pass"
+    )
+    parser.add_argument(
+        "--setting",
+        type=parse_setting,
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="override a setting. VALUE is JSON, or else a string",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="print the functions that took the most time (cumulatively)",
+    )
+    parser.add_argument("--json", action="store_true", help="output JSON")
+    args = parser.parse_args(argv)
+    if args.inline:
+        if not args.lines:
+            parser.error("--inline needs --lines")
+        args.relative_dates = True
+        args.mode = args.mode or "inline"
+
+    engine = BlameEngine(load_settings(dict(args.setting)), args.mode)
+    profiler = cProfile.Profile() if args.profile else None
+
+    runs = []
+    try:
+        for pass_num in range(1, args.repeat + 1):
+            if args.cold:
+                blame_cache.clear()
+            for path in args.paths:
+                if profiler:
+                    profiler.enable()
+                try:
+                    timings = blame_file(engine, os.path.abspath(path), args)
+                finally:
+                    if profiler:
+                        profiler.disable()
+                for t in timings:
+                    runs.append(dict(t.summary(), **{"pass": pass_num}))
+    except Exception as e:
+        print("error: {0}".format(e), file=sys.stderr)  # noqa: T201
+        return 1
+
+    if args.json:
+        print(  # noqa: T201
+            json.dumps({"runs": runs, "cache": blame_cache.stats()}, indent=4)
+        )
+    else:
+        print_table(runs)
+    if profiler:
+        pstats.Stats(profiler, stream=sys.stderr).sort_stats("cumulative").print_stats(
+            30
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
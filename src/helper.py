@@ -0,0 +1,380 @@
+"""
+An optional, long-lived helper process that runs git on behalf of the package and
+remembers the results, so that they survive plugin reloads and are shared by every
+window and every running instance of the editor.
+
+It listens on a Unix domain socket and exits by itself after a period of inactivity.
+The plugin talks to it via HelperClient, and falls back to running git directly
+whenever the helper can't be reached.
+
+This file is ran as a standalone script by whichever Python interpreter the user has
+configured, so it may only import the standard library and `cache` (which has no
+dependencies). The package is normally installed zipped, so both are first copied out
+next to the socket.
+"""
+
+import json
+import os
+import socket
+import stat
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+
+try:
+    from .cache import BlameCache
+except (ImportError, SystemError):
+    # Being ran as a script rather than imported as part of the package.
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from cache import BlameCache  # type: ignore[no-redef]
+
+PROTOCOL_VERSION = 1
+CONNECT_TIMEOUT_SECONDS = 0.5
+STARTUP_TIMEOUT_SECONDS = 2.0
+RESPONSE_TIMEOUT_MARGIN_SECONDS = 1.0
+
+# What the helper needs in order to run as a script.
+SCRIPT_FILENAMES = ("helper.py", "cache.py")
+
+
+class HelperUnavailable(Exception):
+    pass
+
+
+def runtime_dir():
+    """
+    Returns a directory that only the current user can get into, creating it if need
+    be. Anyone who could replace the socket in it could see, and answer, our requests.
+    """
+    base_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if base_dir:
+        path = os.path.join(base_dir, "sublime-git-blame")
+    else:
+        path = os.path.join(
+            tempfile.gettempdir(), "sublime-git-blame-{0}".format(os.getuid())
+        )
+    try:
+        os.makedirs(path, mode=0o700, exist_ok=True)
+        st = os.lstat(path)
+    except OSError as e:
+        raise HelperUnavailable(e)
+    if (
+        not stat.S_ISDIR(st.st_mode)
+        or st.st_uid != os.getuid()
+        or st.st_mode & (stat.S_IRWXG | stat.S_IRWXO)
+    ):
+        raise HelperUnavailable("{0} is not private to this user".format(path))
+    return path
+
+
+def default_socket_path():
+    return os.path.join(runtime_dir(), "helper-v{0}.sock".format(PROTOCOL_VERSION))
+
+
+def read_package_file(path):
+    """
+    Returns the contents of a file in this package, which may be inside the zipped
+    .sublime-package that Package Control installs, rather than on disk.
+    """
+    if os.path.isfile(path):
+        with open(path, "rb") as f:
+            return f.read()
+    archive_path, member_parts = path, []
+    while not os.path.isfile(archive_path):
+        archive_path, part = os.path.split(archive_path)
+        if not part:
+            raise HelperUnavailable("{0} does not exist".format(path))
+        member_parts.insert(0, part)
+    try:
+        with zipfile.ZipFile(archive_path) as archive:
+            return archive.read("/".join(member_parts))
+    except (OSError, KeyError, zipfile.BadZipFile) as e:
+        raise HelperUnavailable(e)
+
+
+def install_script(target_dir):
+    """Copies the helper's script to target_dir, returning the path to run."""
+    source_dir = os.path.dirname(os.path.abspath(__file__))
+    try:
+        for filename in SCRIPT_FILENAMES:
+            target_path = os.path.join(target_dir, filename)
+            # Written under another name first, so that a helper which is being started
+            # concurrently never sees a partly written file.
+            partial_path = "{0}.{1}.partial".format(target_path, os.getpid())
+            with open(partial_path, "wb") as f:
+                f.write(read_package_file(os.path.join(source_dir, filename)))
+            os.replace(partial_path, target_path)
+    except OSError as e:
+        raise HelperUnavailable(e)
+    return os.path.join(target_dir, SCRIPT_FILENAMES[0])
+
+
+def is_supported():
+    return hasattr(socket, "AF_UNIX") and hasattr(os, "getuid")
+
+
+# ------------------------------------------------------------
+# Client side (imported by the plugin)
+
+
+class HelperClient:
+    def __init__(self, socket_path, python_executable, idle_timeout_seconds, budget_mb):
+        self.socket_path = socket_path
+        self.python_executable = python_executable
+        self.idle_timeout_seconds = idle_timeout_seconds
+        self.budget_mb = budget_mb
+
+    def run_git(self, cwd, cli_args, cache_key=None, timeout=None, extra_env=None):
+        """
+        Returns git's output as a string, or raises CalledProcessError/TimeoutExpired
+        just like subprocess.check_output would. Raises HelperUnavailable if the helper could
+        neither be reached nor started, or didn't answer in time.
+        """
+        request = {
+            "op": "git",
+            "cwd": cwd,
+            "args": cli_args,
+            "cache_key": json.dumps(cache_key) if cache_key is not None else None,
+            "timeout": timeout,
+            "extra_env": extra_env or {},
+        }
+        try:
+            sock = self._connect()
+        except HelperUnavailable:
+            self._start()
+            sock = self._connect()
+        # The helper gives up on git after `timeout`, so if there's still no answer
+        # some time after that, the helper itself is stuck.
+        response_timeout = (
+            timeout + RESPONSE_TIMEOUT_MARGIN_SECONDS if timeout is not None else None
+        )
+        response = self._exchange(sock, request, response_timeout)
+
+        if not response.get("ok"):
+            if response.get("timed_out"):
+                raise subprocess.TimeoutExpired(
+                    ["git"] + cli_args, timeout, output=response["output"].encode()
+                )
+            raise subprocess.CalledProcessError(
+                response["returncode"],
+                ["git"] + cli_args,
+                output=response["output"].encode(),
+            )
+        return response["output"]
+
+    def stats(self):
+        return self._exchange(
+            self._connect(), {"op": "stats"}, RESPONSE_TIMEOUT_MARGIN_SECONDS
+        )
+
+    def _connect(self):
+        try:
+            owner_uid = os.stat(self.socket_path).st_uid
+        except OSError as e:
+            raise HelperUnavailable(e)
+        if owner_uid != os.getuid():
+            raise HelperUnavailable(
+                "{0} belongs to another user".format(self.socket_path)
+            )
+
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(CONNECT_TIMEOUT_SECONDS)
+        try:
+            sock.connect(self.socket_path)
+        except OSError as e:
+            sock.close()
+            raise HelperUnavailable(e)
+        return sock
+
+    def _exchange(self, sock, request, response_timeout):
+        """Sends the request over the connected socket, and returns the response."""
+        try:
+            sock.settimeout(response_timeout)
+            sock.sendall(json.dumps(request).encode() + b"\n")
+            response_bytes = _recv_line(sock)
+        except socket.timeout:
+            raise HelperUnavailable(
+                "No response within {0} seconds".format(response_timeout)
+            )
+        except OSError as e:
+            raise HelperUnavailable(e)
+        finally:
+            sock.close()
+        try:
+            return json.loads(response_bytes.decode())
+        except ValueError:
+            raise HelperUnavailable("The helper closed the connection")
+
+    def _start(self):
+        # The directory is private to the user (see runtime_dir), so nobody else can
+        # swap the script for their own.
+        script_path = install_script(os.path.dirname(self.socket_path))
+        cmd_line = [
+            self.python_executable,
+            script_path,
+            "--socket",
+            self.socket_path,
+            "--idle-timeout",
+            str(self.idle_timeout_seconds),
+            "--budget-mb",
+            str(self.budget_mb),
+        ]
+        try:
+            subprocess.Popen(
+                cmd_line,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                # Outlive the plugin host, so that plugin reloads don't kill it.
+                start_new_session=True,
+                close_fds=True,
+            )
+        except OSError as e:
+            raise HelperUnavailable(e)
+
+        deadline = time.time() + STARTUP_TIMEOUT_SECONDS
+        while time.time() < deadline:
+            if os.path.exists(self.socket_path):
+                return
+            time.sleep(0.02)
+        raise HelperUnavailable("The helper did not start in time")
+
+
+def _recv_line(sock):
+    chunks = []
+    while True:
+        chunk = sock.recv(65536)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        if chunk.endswith(b"\n"):
+            break
+    return b"".join(chunks)
+
+
+# ------------------------------------------------------------
+# Server side (ran as a script)
+
+
+class HelperServer:
+    def __init__(self, socket_path, idle_timeout_seconds, budget_mb):
+        self.socket_path = socket_path
+        self.idle_timeout_seconds = idle_timeout_seconds
+        self.cache = BlameCache(budget_bytes=int(budget_mb * 1024 * 1024))
+        self.last_activity = time.time()
+        self.requests_served = 0
+        self.git_processes_spawned = 0
+        self.listener = None
+
+    def serve(self):
+        self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # Only the user that started the helper may talk to it.
+        old_umask = os.umask(0o077)
+        try:
+            self._remove_stale_socket()
+            self.listener.bind(self.socket_path)
+        finally:
+            os.umask(old_umask)
+        self.listener.listen(16)
+        self.listener.settimeout(1.0)
+        try:
+            while time.time() - self.last_activity < self.idle_timeout_seconds:
+                try:
+                    conn, _ = self.listener.accept()
+                except socket.timeout:
+                    continue
+                self.last_activity = time.time()
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+        finally:
+            self.listener.close()
+            try:
+                os.remove(self.socket_path)
+            except OSError:
+                pass
+
+    def _remove_stale_socket(self):
+        if not os.path.exists(self.socket_path):
+            return
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.socket_path)
+        except OSError:
+            os.remove(self.socket_path)
+        else:
+            # Another helper is already serving.
+            sys.exit(0)
+        finally:
+            probe.close()
+
+    def _handle(self, conn):
+        try:
+            request = json.loads(_recv_line(conn).decode())
+            if request["op"] == "git":
+                response = self._git(request)
+            elif request["op"] == "stats":
+                response = {
+                    "ok": True,
+                    "requests_served": self.requests_served,
+                    "git_processes_spawned": self.git_processes_spawned,
+                    "cache": self.cache.stats(),
+                }
+            else:
+                response = {"ok": False, "returncode": -1, "output": "Unknown op"}
+            conn.sendall(json.dumps(response).encode() + b"\n")
+        except (OSError, ValueError, KeyError):
+            pass
+        finally:
+            conn.close()
+            self.requests_served += 1
+            self.last_activity = time.time()
+
+    def _git(self, request):
+        cache_key = request.get("cache_key")
+        if cache_key is not None:
+            output = self.cache.get(cache_key)
+            if output is not None:
+                return {"ok": True, "output": output}
+
+        self.git_processes_spawned += 1
+        try:
+            output = subprocess.check_output(
+                ["git"] + request["args"],
+                cwd=request["cwd"],
+                env=dict(os.environ, **request.get("extra_env", {})),
+                stderr=subprocess.STDOUT,
+                timeout=request.get("timeout"),
+            ).decode()
+        except subprocess.TimeoutExpired as e:
+            output = (e.output or b"").decode()
+            return {"ok": False, "timed_out": True, "output": output}
+        except subprocess.CalledProcessError as e:
+            return {
+                "ok": False,
+                "returncode": e.returncode,
+                "output": e.output.decode(),
+            }
+        except OSError as e:
+            return {"ok": False, "returncode": -1, "output": str(e)}
+
+        if cache_key is not None:
+            self.cache.put(cache_key, output)
+        return {"ok": True, "output": output}
+
+
+def main(argv):
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--socket")
+    parser.add_argument("--idle-timeout", type=float, default=600)
+    parser.add_argument("--budget-mb", type=float, default=256)
+    args = parser.parse_args(argv)
+    socket_path = args.socket or default_socket_path()
+    HelperServer(socket_path, args.idle_timeout, args.budget_mb).serve()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
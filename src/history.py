@@ -0,0 +1,88 @@
+import subprocess
+import threading
+
+# NOTE: Nothing in this module may import `sublime`, so that it can be exercised
+# outside of the editor.
+
+FIELD_SEPARATOR = "\x00"
+LOG_CLI_ARGS = [
+    "log",
+    "--no-color",
+    "--date=short",
+    "--format=%H%x00%h%x00%an%x00%ad%x00%s",
+]
+
+
+class LogEntry:
+    __slots__ = ("sha", "short_sha", "author", "date", "subject")
+
+    def __init__(self, sha, short_sha, author, date, subject):
+        self.sha = sha
+        self.short_sha = short_sha
+        self.author = author
+        self.date = date
+        self.subject = subject
+
+
+def parse_log_line(line):
+    fields = line.rstrip("\n").split(FIELD_SEPARATOR)
+    if len(fields) != 5:
+        return None
+    return LogEntry(*fields)
+
+
+class LogPager:
+    """
+    Reads the output of a single, long-lived `git log` process a page at a time, so
+    that the newest commits are available long before git would have finished walking
+    the whole history. The process is stopped as soon as nothing more is wanted.
+    """
+
+    def __init__(self, cmd_line, cwd, startupinfo=None, env=None):
+        self.entries = []  # type: list[LogEntry] # type: ignore[misc]
+        self.exhausted = False
+        # Whatever git printed that wasn't a log entry, e.g. an error message.
+        self.other_output = []  # type: list[str] # type: ignore[misc]
+        self.returncode = None  # type: int | None # type: ignore[misc]
+        self._lock = threading.Lock()
+        self._process = subprocess.Popen(
+            cmd_line,
+            cwd=cwd,
+            env=env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            startupinfo=startupinfo,
+        )
+
+    def load(self, count):
+        """
+        Make sure that at least `count` entries have been read, if there are that
+        many. Returns how many entries there are now.
+        """
+        with self._lock:
+            while len(self.entries) < count and not self.exhausted:
+                line = self._process.stdout.readline()
+                if not line:
+                    self._finish()
+                    break
+                text = line.decode(errors="replace")
+                entry = parse_log_line(text)
+                if entry is None:
+                    self.other_output.append(text)
+                else:
+                    self.entries.append(entry)
+            return len(self.entries)
+
+    def close(self):
+        # Not under the lock, as another thread may be waiting on git in load().
+        # Killing git makes that return promptly.
+        if self._process.poll() is None:
+            self._process.kill()
+        with self._lock:
+            if not self.exhausted:
+                self._finish()
+
+    def _finish(self):
+        self.exhausted = True
+        self._process.stdout.close()
+        self.returncode = self._process.wait()
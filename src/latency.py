@@ -0,0 +1,65 @@
+import threading
+
+# NOTE: Nothing in this module may import `sublime`, so that it can be exercised
+# outside of the editor.
+
+
+class _RepoLatency:
+    __slots__ = ("lookup_ms", "hit_rate", "samples")
+
+    def __init__(self):
+        self.lookup_ms = None
+        self.hit_rate = 0.0
+        self.samples = 0
+
+
+class LatencyTracker:
+    """
+    Exponentially weighted, per-repository statistics about how long blame lookups
+    take when git actually has to be ran, and (for diagnostics) how often they are
+    instead answered from the cache.
+    """
+
+    # How much weight the most recent sample gets.
+    SMOOTHING = 0.3
+
+    def __init__(self):
+        self._by_repo = {}  # type: dict[str, _RepoLatency] # type: ignore[misc]
+        self._lock = threading.Lock()
+
+    def record(self, repo, elapsed_ms, cache_hit):
+        with self._lock:
+            stats = self._by_repo.setdefault(repo, _RepoLatency())
+            stats.samples += 1
+            stats.hit_rate = self._smooth(stats.hit_rate, 1.0 if cache_hit else 0.0)
+            if not cache_hit:
+                if stats.lookup_ms is None:
+                    stats.lookup_ms = elapsed_ms
+                else:
+                    stats.lookup_ms = self._smooth(stats.lookup_ms, elapsed_ms)
+
+    def lookup_ms(self, repo):
+        """
+        The time that a lookup in the repo that isn't answered from the cache is
+        expected to take, or None if nothing is known about the repo yet.
+        """
+        with self._lock:
+            stats = self._by_repo.get(repo)
+            return stats.lookup_ms if stats is not None else None
+
+    def stats(self):
+        with self._lock:
+            return {
+                repo: {
+                    "lookup_ms": stats.lookup_ms,
+                    "hit_rate": stats.hit_rate,
+                    "samples": stats.samples,
+                }
+                for repo, stats in self._by_repo.items()
+            }
+
+    def _smooth(self, old, new):
+        return old + self.SMOOTHING * (new - old)
+
+
+inline_blame_latency = LatencyTracker()
@@ -0,0 +1,20 @@
+import sublime_plugin
+
+from .base import shared_cache
+from .prefetch import commit_prefetcher
+
+
+class BlameMemoryListener(sublime_plugin.EventListener):
+
+    # Overrides begin ------------------------------------------------------------------
+
+    def on_activated(self, view):
+        # Views that are not the active one are evicted from first when the cache
+        # is over budget.
+        shared_cache().set_active_view(view.id())
+
+    def on_close(self, view):
+        commit_prefetcher.cancel_view(view.id())
+        shared_cache().release_view(view.id())
+
+    # Overrides end --------------------------------------------------------------------
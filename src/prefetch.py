@@ -0,0 +1,136 @@
+import threading
+from collections import deque
+
+from .cache import estimate_size
+
+# NOTE: Nothing in this module may import `sublime`, so that it can be exercised
+# outside of the editor.
+
+DEFAULT_MAX_BYTES = 4 * 1024 * 1024
+
+
+class _Job:
+    __slots__ = ("owner", "generation", "fetch", "forget")
+
+    def __init__(self, owner, generation, fetch, forget):
+        self.owner = owner
+        self.generation = generation
+        self.fetch = fetch
+        self.forget = forget
+
+
+class Prefetcher:
+    """
+    Speculatively fetches things (in practice, the full text of commits) on a single
+    background thread, in case the user is about to ask for them.
+
+    Every job belongs to an owner, which is a (view_id, name) tuple identifying what
+    on screen made the job seem worthwhile. Cancelling an owner drops its queued jobs
+    and stops its bytes counting towards `max_bytes`, which is a cap on how much
+    speculatively fetched data is being held on behalf of live owners.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.prefetched_bytes = 0
+        self.completed = 0
+        self.cancelled = 0
+        self.over_budget = 0
+        self._bytes_by_owner = {}  # type: dict[tuple, int] # type: ignore[misc]
+        self._generations = {}  # type: dict[tuple, int] # type: ignore[misc]
+        self._jobs = deque()  # type: deque[_Job] # type: ignore[misc]
+        self._running = 0
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def submit(self, owner, fetch, forget):
+        """
+        `fetch()` does the work and returns the fetched value. `forget()` is called
+        if the value turned out to be too big to keep.
+        """
+        with self._cond:
+            generation = self._generations.get(owner, 0)
+            self._jobs.append(_Job(owner, generation, fetch, forget))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._work, daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+
+    def cancel(self, owner):
+        with self._cond:
+            self._cancel_locked(owner)
+
+    def cancel_view(self, view_id):
+        with self._cond:
+            owners = set(self._generations) | {job.owner for job in self._jobs}
+            for owner in owners:
+                if owner[0] == view_id:
+                    self._cancel_locked(owner)
+                    self._generations.pop(owner, None)
+
+    def wait_until_idle(self, timeout=None):
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: not self._jobs and not self._running, timeout
+            )
+
+    def stats(self):
+        with self._cond:
+            return {
+                "queued": len(self._jobs),
+                "prefetched_bytes": self.prefetched_bytes,
+                "max_bytes": self.max_bytes,
+                "completed": self.completed,
+                "cancelled": self.cancelled,
+                "over_budget": self.over_budget,
+            }
+
+    # ------------------------------------------------------------
+
+    def _cancel_locked(self, owner):
+        self._generations[owner] = self._generations.get(owner, 0) + 1
+        queued_before = len(self._jobs)
+        self._jobs = deque(job for job in self._jobs if job.owner != owner)
+        self.cancelled += queued_before - len(self._jobs)
+        self.prefetched_bytes -= self._bytes_by_owner.pop(owner, 0)
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._jobs:
+                    self._cond.wait()
+                job = self._jobs.popleft()
+                if self.prefetched_bytes >= self.max_bytes:
+                    self.over_budget += 1
+                    self._cond.notify_all()
+                    continue
+                self._running += 1
+
+            try:
+                value = job.fetch()
+            except Exception:  # It was only speculative.
+                value = None
+
+            with self._cond:
+                self._running -= 1
+                if value is not None:
+                    self._account_locked(job, estimate_size(value))
+                self._cond.notify_all()
+
+    def _account_locked(self, job, size):
+        if self._generations.get(job.owner, 0) != job.generation:
+            # Cancelled while it was being fetched. The value stays wherever fetch()
+            # put it, but is no longer held on the owner's behalf.
+            self.cancelled += 1
+        elif self.prefetched_bytes + size > self.max_bytes:
+            self.over_budget += 1
+            job.forget()
+        else:
+            self.completed += 1
+            self.prefetched_bytes += size
+            self._bytes_by_owner[job.owner] = (
+                self._bytes_by_owner.get(job.owner, 0) + size
+            )
+
+
+commit_prefetcher = Prefetcher()
@@ -0,0 +1,146 @@
+import os
+
+# NOTE: Nothing in this module may import `sublime`, so that it can be exercised
+# outside of the editor.
+
+
+class RepoLocation:
+    def __init__(self, worktree, git_dir, common_dir):
+        # The directory that contains the `.git` entry.
+        self.worktree = worktree
+        # Per-worktree state such as `index` and `HEAD` lives here.
+        self.git_dir = git_dir
+        # Shared state such as `objects` and `config` lives here. Only differs from
+        # git_dir for linked worktrees (`git worktree add`).
+        self.common_dir = common_dir
+
+
+# Keyed by directory path. Repositories don't tend to appear and disappear underneath
+# open files, so remembering the walk up the directory tree is worthwhile.
+_repo_location_memo = {}  # type: dict[str, RepoLocation | None] # type: ignore[misc]
+
+
+def find_repo(path):
+    """
+    Locate the git repository that the given file belongs to by looking for a `.git`
+    entry in its directory or any ancestor directory. Returns None if there isn't one.
+    This deliberately doesn't spawn `git rev-parse`, because it's called on hot paths.
+    """
+    start_dir = os.path.dirname(os.path.realpath(path))
+    if start_dir in _repo_location_memo:
+        return _repo_location_memo[start_dir]
+
+    location = None
+    candidate_dir = start_dir
+    while True:
+        dot_git = os.path.join(candidate_dir, ".git")
+        if os.path.isdir(dot_git):
+            location = _location_from_git_dir(candidate_dir, dot_git)
+            break
+        if os.path.isfile(dot_git):
+            # Linked worktrees and submodules have a `.git` file pointing elsewhere.
+            git_dir = _read_gitdir_pointer(candidate_dir, dot_git)
+            if git_dir:
+                location = _location_from_git_dir(candidate_dir, git_dir)
+            break
+        parent_dir = os.path.dirname(candidate_dir)
+        if parent_dir == candidate_dir:
+            break
+        candidate_dir = parent_dir
+
+    _repo_location_memo[start_dir] = location
+    return location
+
+
+def _read_gitdir_pointer(worktree, dot_git_file):
+    try:
+        with open(dot_git_file, encoding="utf-8") as f:
+            content = f.read().strip()
+    except OSError:
+        return None
+    prefix = "gitdir:"
+    if not content.startswith(prefix):
+        return None
+    return os.path.normpath(os.path.join(worktree, content[len(prefix) :].strip()))
+
+
+def _location_from_git_dir(worktree, git_dir):
+    common_dir = git_dir
+    try:
+        with open(os.path.join(git_dir, "commondir"), encoding="utf-8") as f:
+            common_dir = os.path.normpath(os.path.join(git_dir, f.read().strip()))
+    except OSError:
+        pass
+    return RepoLocation(worktree, git_dir, common_dir)
+
+
+def _mtime_ns(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def file_state(path):
+    """
+    A cheap token that changes whenever the result of blaming the given file could
+    have changed: either the file itself was rewritten, or the repository's index was
+    (which happens on commit, checkout, reset, etc.). Returns None if the file can't
+    be stat'ed, in which case nothing about it should be cached.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    repo = find_repo(path)
+    index_mtime = _mtime_ns(os.path.join(repo.git_dir, "index")) if repo else None
+    head_mtime = _mtime_ns(os.path.join(repo.git_dir, "HEAD")) if repo else None
+    return (st.st_mtime_ns, st.st_size, index_mtime, head_mtime)
+
+
+def repo_key(path):
+    """A string identifying the repository that the given file belongs to."""
+    repo = find_repo(path)
+    if repo:
+        return repo.common_dir
+    return os.path.dirname(os.path.realpath(path))
+
+
+# Keyed by common dir. Values are (config mtime, is partial clone).
+_partial_clone_memo = {}  # type: dict[str, tuple] # type: ignore[misc]
+
+
+def is_partial_clone(repo):
+    """
+    Whether the repo was cloned with a filter (e.g. `--filter=blob:none`), meaning that
+    git may try to lazily fetch missing objects from a "promisor" remote. Determined by
+    reading the repo's config file rather than running `git config`.
+    """
+    config_path = os.path.join(repo.common_dir, "config")
+    config_mtime = _mtime_ns(config_path)
+    memo = _partial_clone_memo.get(repo.common_dir)
+    if memo is not None and memo[0] == config_mtime:
+        return memo[1]
+
+    partial = False
+    section = ""
+    try:
+        with open(config_path, encoding="utf-8", errors="replace") as f:
+            for line in f:
+                line = line.strip()
+                if line.startswith("["):
+                    # e.g. [extensions] or [remote "origin"]
+                    section = (line.strip("[]").split() or [""])[0].lower()
+                    continue
+                key, _, value = line.partition("=")
+                key = key.strip().lower()
+                value = value.strip().lower()
+                if section == "extensions" and key == "partialclone" and value:
+                    partial = True
+                elif section == "remote" and key == "promisor" and value == "true":
+                    partial = True
+    except OSError:
+        pass
+
+    _partial_clone_memo[repo.common_dir] = (config_mtime, partial)
+    return partial
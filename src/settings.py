@@ -1,7 +1,8 @@
-import sublime
-
-
 def pkg_settings():
+    # NOTE: `sublime` is imported here rather than at the top of the module, so that
+    # the settings keys below can be used outside of the editor (see engine.py).
+    import sublime
+
     # NOTE: The sublime.load_settings(...) call has to be deferred to this function,
     # rather than just being called immediately and assigning a module-level variable,
     # because of: https://www.sublimetext.com/docs/3/api_reference.html#plugin_lifecycle
@@ -9,6 +10,23 @@ def pkg_settings():
 
 
 PKG_SETTINGS_KEY_CUSTOMBLAMEFLAGS = "custom_blame_flags"
+PKG_SETTINGS_KEY_BLAME_SINCE = "blame_since"
+PKG_SETTINGS_KEY_BLAME_SINCE_REVISION = "blame_since_revision"
+
+PKG_SETTINGS_KEY_LATENCY_BUDGETS = "latency_budgets_ms"
+
+PKG_SETTINGS_KEY_CACHE_BUDGET_MB = "cache_budget_mb"
+
+PKG_SETTINGS_KEY_PREFETCH_ENABLED = "prefetch_commit_details"
+PKG_SETTINGS_KEY_PREFETCH_MAX_KB = "prefetch_max_kb"
+
+PKG_SETTINGS_KEY_REPO_ADVICE_ENABLED = "suggest_repository_optimisation"
+
+PKG_SETTINGS_KEY_HELPER_ENABLED = "helper_process_enabled"
+PKG_SETTINGS_KEY_HELPER_PYTHON = "helper_process_python"
+PKG_SETTINGS_KEY_HELPER_IDLE_TIMEOUT = "helper_process_idle_timeout"
 
 PKG_SETTINGS_KEY_INLINE_BLAME_ENABLED = "inline_blame_enabled"
 PKG_SETTINGS_KEY_INLINE_BLAME_DELAY = "inline_blame_delay"
+PKG_SETTINGS_KEY_INLINE_BLAME_ADAPTIVE_DELAY = "inline_blame_adaptive_delay"
+PKG_SETTINGS_KEY_INLINE_BLAME_DELAY_MAX = "inline_blame_delay_max"
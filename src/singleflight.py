@@ -0,0 +1,78 @@
+import threading
+
+# NOTE: Nothing in this module may import `sublime`, so that it can be exercised
+# outside of the editor.
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None  # type: BaseException | None # type: ignore[misc]
+
+
+class SingleFlight:
+    """
+    Coalesces identical calls that overlap in time. The first caller for a key does
+    the work, and any callers that arrive with the same key while it's still running
+    wait for it and receive the same result (or exception) instead of repeating it.
+
+    Nothing is remembered once a call has finished. That's what the caches are for.
+    """
+
+    def __init__(self):
+        self.started = 0
+        self.coalesced = 0
+        self._coalesced_by_label = {}  # type: dict[str, int] # type: ignore[misc]
+        self._calls = {}  # type: dict[object, _Call] # type: ignore[misc]
+        self._lock = threading.Lock()
+
+    def run(self, key, fn, label=None):
+        """
+        Returns `fn()`, unless a call with an equal `key` is already in flight, in
+        which case that call's outcome is returned. `label` only serves to break down
+        the number of coalesced calls in `stats()`.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leading = call is None
+            if leading:
+                call = _Call()
+                self._calls[key] = call
+                self.started += 1
+            else:
+                self.coalesced += 1
+                self._coalesced_by_label[label] = (
+                    self._coalesced_by_label.get(label, 0) + 1
+                )
+
+        if not leading:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def stats(self):
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "started": self.started,
+                "coalesced": self.coalesced,
+                "coalesced_by_label": dict(self._coalesced_by_label),
+            }
+
+
+git_single_flight = SingleFlight()
@@ -6,8 +6,8 @@ blame_phantom_html_template = """
             <span class="message">
                 <strong>Git Blame</strong> ({author})
                 {date} {time} |
-                <a href="prev?sha={qs_sha_val}&amp;row_num={qs_row_num_val}&amp;{qs_skip_keyvals}">[Prev]</a>
-                {sha}{sha_not_latest_indicator}
+                <a href="prev?sha={qs_sha_val}&amp;row_num={qs_row_num_val}&amp;{qs_skip_keyvals}{qs_bound_keyvals}">[Prev]</a>
+                {sha}{sha_not_latest_indicator}{depth_bound_indicator}
                 <a href="copy?sha={qs_sha_val}">[Copy]</a>
                 <a href="show?sha={qs_sha_val}">[Show]</a>
                 <a class="close" href="close">\u00D7</a>
@@ -99,6 +99,16 @@ blame_inline_phantom_html_template = """
 """
 
 
+blame_inline_notice_phantom_html_template = """
+    <body id="inline-git-blame">
+        <style>{css}</style>
+        <div class="phantom">
+            <span class="message">{message}</span>
+        </div>
+    </body>
+"""
+
+
 blame_inline_phantom_css = """
     div.phantom {
         color: color(color(var(--bluish) blend(var(--background) 60%)) min-contrast(var(--background) 2.0));
@@ -109,3 +119,7 @@ blame_inline_phantom_css = """
         text-decoration: inherit;
     }
 """
+
+# ------------------------------------------------------------
+
+depth_bound_marker = "last changed before {bound}"
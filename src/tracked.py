@@ -0,0 +1,40 @@
+import os
+import sys
+
+# NOTE: Nothing in this module may import `sublime`, so that it can be exercised
+# outside of the editor.
+
+# Lists every path in the index, relative to the top of the worktree, regardless of
+# which directory git is ran from.
+LS_FILES_CLI_ARGS = ["ls-files", "-z", "--full-name", ":/"]
+
+
+def index_token(repo):
+    """
+    Changes whenever the set of tracked files could have changed, as that always
+    involves rewriting the index. None if the repo doesn't have an index (yet).
+    """
+    try:
+        st = os.stat(os.path.join(repo.git_dir, "index"))
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def parse_ls_files(output):
+    return frozenset(_normalise(p) for p in output.split("\0") if p)
+
+
+def size_of(tracked_paths):
+    """Approximate number of bytes that a set from parse_ls_files() keeps alive."""
+    return sys.getsizeof(tracked_paths) + sum(sys.getsizeof(p) for p in tracked_paths)
+
+
+def relative_path(repo, path):
+    """The given file's path in the form that `git ls-files` lists it in."""
+    return _normalise(os.path.relpath(os.path.realpath(path), repo.worktree))
+
+
+def _normalise(path):
+    # On case-insensitive platforms, the editor and git may disagree about case.
+    return os.path.normcase(path).replace(os.sep, "/")
@@ -0,0 +1,130 @@
+"""
+Test harness for running this package's commands outside of Sublime Text, against a
+fake `git` executable that records every invocation and replays canned outputs.
+"""
+
+import importlib
+import json
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import types
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+PKG_DIR = os.path.dirname(TESTS_DIR)
+PKG_NAME = "Git blame"
+
+FAKE_GIT_SCRIPT = """#!{python}
+import json
+import os
+import sys
+import time
+
+args = sys.argv[1:]
+with open(os.environ["FAKE_GIT_LOG"], "a", encoding="utf-8") as f:
+    f.write(json.dumps(args) + "\\n")
+with open(os.environ["FAKE_GIT_RESPONSES"], encoding="utf-8") as f:
+    responses = json.load(f)
+for response in responses:
+    if all(m in args for m in response["match"]):
+        time.sleep(response["sleep"])
+        sys.stdout.write(response["stdout"])
+        sys.exit(response["exit_code"])
+sys.stdout.write("fake git: no canned output for {{0}}\\n".format(args))
+sys.exit(1)
+"""
+
+
+def running_inside_sublime():
+    try:
+        import sublime  # noqa: F401
+    except ImportError:
+        return False
+    return not getattr(sublime, "__file__", "").startswith(TESTS_DIR)
+
+
+def import_package_module(name):
+    """
+    Import one of this package's modules (e.g. "src.blame") with the stub `sublime`
+    and `sublime_plugin` modules standing in for the real ones.
+    """
+    stubs_dir = os.path.join(TESTS_DIR, "stubs")
+    if stubs_dir not in sys.path:
+        sys.path.insert(0, stubs_dir)
+    if PKG_NAME not in sys.modules:
+        # Our package name has a space in it, so it can't be imported normally.
+        pkg = types.ModuleType(PKG_NAME)
+        pkg.__path__ = [PKG_DIR]  # type: ignore[attr-defined]
+        sys.modules[PKG_NAME] = pkg
+    return importlib.import_module(PKG_NAME + "." + name)
+
+
+class FakeGit:
+    def __init__(self):
+        self.bin_dir = tempfile.mkdtemp(prefix="fake-git-")
+        self.log_path = os.path.join(self.bin_dir, "invocations.jsonl")
+        self.responses_path = os.path.join(self.bin_dir, "responses.json")
+        self.responses = []
+        self.saved_environ = None
+
+        script_path = os.path.join(self.bin_dir, "git")
+        with open(script_path, "w", encoding="utf-8") as f:
+            f.write(FAKE_GIT_SCRIPT.format(python=sys.executable))
+        os.chmod(script_path, os.stat(script_path).st_mode | stat.S_IEXEC)
+        self._write_responses()
+        self.reset()
+
+    def install(self):
+        self.saved_environ = dict(os.environ)
+        os.environ["PATH"] = self.bin_dir + os.pathsep + os.environ.get("PATH", "")
+        os.environ["FAKE_GIT_LOG"] = self.log_path
+        os.environ["FAKE_GIT_RESPONSES"] = self.responses_path
+
+    def uninstall(self):
+        os.environ.clear()
+        os.environ.update(self.saved_environ)
+        shutil.rmtree(self.bin_dir, ignore_errors=True)
+
+    def respond(self, match, stdout, exit_code=0, sleep=0, override=False):
+        """
+        Make invocations whose arguments include all of `match` print `stdout`,
+        optionally after taking `sleep` seconds to do so. Earlier registrations take
+        precedence over later ones, unless `override` is given.
+        """
+        self.responses.insert(
+            0 if override else len(self.responses),
+            {
+                "match": list(match),
+                "stdout": stdout,
+                "exit_code": exit_code,
+                "sleep": sleep,
+            },
+        )
+        self._write_responses()
+
+    def invocations(self):
+        with open(self.log_path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+
+    def reset(self):
+        open(self.log_path, "w").close()
+
+    def _write_responses(self):
+        with open(self.responses_path, "w", encoding="utf-8") as f:
+            json.dump(self.responses, f)
+
+
+def make_fake_repo(file_name, text):
+    """Create a directory that looks enough like a git worktree for the package."""
+    worktree = tempfile.mkdtemp(prefix="fake-repo-")
+    git_dir = os.path.join(worktree, ".git")
+    os.mkdir(git_dir)
+    for name, content in (("HEAD", "ref: refs/heads/main\n"), ("index", "")):
+        with open(os.path.join(git_dir, name), "w", encoding="utf-8") as f:
+            f.write(content)
+    path = os.path.join(worktree, file_name)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    return worktree, path
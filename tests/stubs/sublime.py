@@ -0,0 +1,286 @@
+# A minimal stand-in for Sublime Text's `sublime` API module, sufficient for driving
+# this package's commands and listeners outside of the editor. Only what the package
+# actually uses is implemented.
+
+import json
+import os
+
+LAYOUT_INLINE = 0
+LAYOUT_BELOW = 1
+LAYOUT_BLOCK = 2
+
+_PKG_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+clipboard = ""
+status_messages = []
+error_messages = []
+message_dialogs = []
+_windows = []
+_settings = {}
+
+
+def version():
+    return "4000"
+
+
+def set_timeout(callback, delay=0):
+    # Run immediately, so that tests are deterministic.
+    callback()
+
+
+def set_timeout_async(callback, delay=0):
+    callback()
+
+
+def set_clipboard(text):
+    global clipboard
+    clipboard = text
+
+
+def status_message(msg):
+    status_messages.append(msg)
+
+
+def error_message(msg):
+    error_messages.append(msg)
+
+
+def message_dialog(msg):
+    message_dialogs.append(msg)
+
+
+def ok_cancel_dialog(msg, ok_title=""):
+    message_dialogs.append(msg)
+    return False
+
+
+def windows():
+    return list(_windows)
+
+
+def active_window():
+    if not _windows:
+        _windows.append(Window())
+    return _windows[0]
+
+
+def load_settings(base_name):
+    if base_name not in _settings:
+        path = os.path.join(_PKG_DIR, "Settings", base_name)
+        with open(path, encoding="utf-8") as f:
+            lines = [ln for ln in f if not ln.strip().startswith("//")]
+        _settings[base_name] = Settings(json.loads("".join(lines)))
+    return _settings[base_name]
+
+
+def reset():
+    global clipboard
+    clipboard = ""
+    del status_messages[:]
+    del error_messages[:]
+    del message_dialogs[:]
+    del _windows[:]
+    _settings.clear()
+
+
+class Settings:
+    def __init__(self, values=None):
+        self._values = dict(values or {})
+        self._callbacks = {}
+
+    def get(self, key, default=None):
+        return self._values.get(key, default)
+
+    def set(self, key, value):
+        self._values[key] = value
+
+    def erase(self, key):
+        self._values.pop(key, None)
+
+    def has(self, key):
+        return key in self._values
+
+    def add_on_change(self, tag, callback):
+        self._callbacks[tag] = callback
+
+    def clear_on_change(self, tag):
+        self._callbacks.pop(tag, None)
+
+
+class Region:
+    def __init__(self, a, b=None):
+        self.a = a
+        self.b = a if b is None else b
+
+    def begin(self):
+        return min(self.a, self.b)
+
+    def end(self):
+        return max(self.a, self.b)
+
+    def size(self):
+        return self.end() - self.begin()
+
+    def empty(self):
+        return self.a == self.b
+
+    def __eq__(self, other):
+        return (self.a, self.b) == (other.a, other.b)
+
+    def __repr__(self):
+        return "Region({0}, {1})".format(self.a, self.b)
+
+
+class Phantom:
+    def __init__(self, region, content, layout, on_navigate=None):
+        self.region = region
+        self.content = content
+        self.layout = layout
+        self.on_navigate = on_navigate
+
+
+class PhantomSet:
+    def __init__(self, view, key=""):
+        self.view = view
+        self.key = key
+        self.phantoms = []
+
+    def update(self, phantoms):
+        self.phantoms = list(phantoms)
+        self.view.phantoms[self.key] = self.phantoms
+
+
+class Window:
+    _next_id = 1
+
+    def __init__(self):
+        self._id = Window._next_id
+        Window._next_id += 1
+        self._views = []
+
+    def id(self):
+        return self._id
+
+    def views(self):
+        return list(self._views)
+
+    def new_file(self):
+        view = View(window=self)
+        self._views.append(view)
+        return view
+
+    def show_quick_panel(
+        self, items, on_select, flags=0, selected_index=-1, on_highlight=None
+    ):
+        self.quick_panel = (items, on_select, selected_index, on_highlight)
+
+    def run_command(self, cmd, args=None):
+        pass
+
+
+class View:
+    _next_id = 1
+
+    def __init__(self, file_name=None, text="", window=None):
+        self._id = View._next_id
+        View._next_id += 1
+        self._file_name = file_name
+        self._text = text
+        self._window = window
+        self._settings = Settings()
+        self._dirty = False
+        self._sel = [Region(0)]
+        self.phantoms = {}
+        self.commands = []
+        self._name = ""
+
+    # Text geometry ------------------------------------------------------------
+
+    def _line_starts(self):
+        starts = [0]
+        for i, ch in enumerate(self._text):
+            if ch == "\n":
+                starts.append(i + 1)
+        return starts
+
+    def text_point(self, row, col):
+        starts = self._line_starts()
+        row = max(0, min(row, len(starts) - 1))
+        return starts[row] + col
+
+    def rowcol(self, pt):
+        starts = self._line_starts()
+        row = 0
+        for i, start in enumerate(starts):
+            if start <= pt:
+                row = i
+        return (row, pt - starts[row])
+
+    def line(self, x):
+        region = x if isinstance(x, Region) else Region(x)
+        begin = self._text.rfind("\n", 0, region.begin()) + 1
+        end = self._text.find("\n", region.end())
+        if end == -1:
+            end = len(self._text)
+        return Region(begin, end)
+
+    def size(self):
+        return len(self._text)
+
+    # Misc ---------------------------------------------------------------------
+
+    def id(self):
+        return self._id
+
+    def file_name(self):
+        return self._file_name
+
+    def is_dirty(self):
+        return self._dirty
+
+    def sel(self):
+        return self._sel
+
+    def set_carets(self, *rows):
+        self._sel = [Region(self.text_point(row, 0)) for row in rows]
+
+    def settings(self):
+        return self._settings
+
+    def window(self):
+        if self._window is None:
+            self._window = active_window()
+        return self._window
+
+    def element(self):
+        return None
+
+    def erase_phantoms(self, key):
+        self.phantoms.pop(key, None)
+
+    def run_command(self, cmd, args=None):
+        self.commands.append((cmd, args))
+
+    def layout_extent(self):
+        return (0.0, 0.0)
+
+    def viewport_position(self):
+        return (0.0, 0.0)
+
+    def set_viewport_position(self, xy, animate=True):
+        pass
+
+    def set_scratch(self, scratch):
+        pass
+
+    def assign_syntax(self, syntax):
+        pass
+
+    def set_name(self, name):
+        self._name = name
+
+    def set_read_only(self, read_only):
+        pass
+
+    def insert(self, edit, pt, text):
+        self._text = self._text[:pt] + text + self._text[pt:]
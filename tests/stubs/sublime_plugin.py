@@ -0,0 +1,20 @@
+# A minimal stand-in for Sublime Text's `sublime_plugin` module. See `sublime.py`.
+
+
+class TextCommand:
+    def __init__(self, view):
+        self.view = view
+
+
+class WindowCommand:
+    def __init__(self, window):
+        self.window = window
+
+
+class EventListener:
+    pass
+
+
+class ViewEventListener:
+    def __init__(self, view):
+        self.view = view
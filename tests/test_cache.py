@@ -0,0 +1,41 @@
+import importlib
+import unittest
+
+# This strange form of import is required because our ST package name has a space in it.
+cache = importlib.import_module("Git blame.src.cache")
+
+
+class TestCache(unittest.TestCase):
+    def test_background_views_are_evicted_before_the_active_one(self):
+        c = cache.BlameCache(budget_bytes=300)
+        c.set_active_view(1)
+        c.put("active", None, view_id=1, size=100)
+        c.put("background", None, view_id=2, size=100)
+        c.put("shared", None, size=100)
+        c.put("newest", None, view_id=2, size=100)
+        self.assertIn("active", c)
+        self.assertNotIn("background", c)
+        self.assertIn("shared", c)
+        self.assertIn("newest", c)
+        self.assertEqual(c.total_bytes, 300)
+
+    def test_closing_a_view_releases_its_entries(self):
+        evicted = []
+        c = cache.BlameCache(budget_bytes=1000)
+        c.put("a", "x", view_id=1, size=10, on_evict=lambda: evicted.append("a"))
+        c.put("b", "y", view_id=2, size=10)
+        c.release_view(1)
+        self.assertNotIn("a", c)
+        self.assertIn("b", c)
+        self.assertEqual(c.total_bytes, 10)
+        # Being released is not the same as being evicted.
+        self.assertEqual(evicted, [])
+
+    def test_eviction_callback(self):
+        evicted = []
+        c = cache.BlameCache(budget_bytes=100)
+        c.put("a", None, view_id=1, size=60, on_evict=lambda: evicted.append("a"))
+        c.put("b", None, view_id=1, size=60)
+        self.assertEqual(evicted, ["a"])
+        self.assertEqual(c.get("b"), None)
+        self.assertNotIn("a", c)
@@ -0,0 +1,49 @@
+import importlib
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+# This strange form of import is required because our ST package name has a space in it.
+commit_graph = importlib.import_module("Git blame.src.commit_graph")
+
+
+def git(cwd, *args):
+    return subprocess.check_output(
+        ["git", "-c", "user.name=A", "-c", "user.email=a@example.com"] + list(args),
+        cwd=cwd,
+        stderr=subprocess.STDOUT,
+    )
+
+
+@unittest.skipUnless(shutil.which("git"), "Needs git")
+class TestCommitGraph(unittest.TestCase):
+    def setUp(self):
+        self.repo = tempfile.mkdtemp()
+        git(self.repo, "init", "-q")
+        with open(os.path.join(self.repo, "f"), "w") as f:
+            f.write("x\n")
+        git(self.repo, "add", "f")
+        git(self.repo, "commit", "-q", "-m", "x")
+        self.git_dir = os.path.join(self.repo, ".git")
+
+    def tearDown(self):
+        shutil.rmtree(self.repo, ignore_errors=True)
+
+    def test_inspect(self):
+        self.assertEqual(
+            commit_graph.inspect(self.git_dir), commit_graph.STATUS_MISSING
+        )
+
+        git(self.repo, "commit-graph", "write", "--reachable")
+        self.assertEqual(
+            commit_graph.inspect(self.git_dir), commit_graph.STATUS_NO_BLOOM_FILTERS
+        )
+
+        git(self.repo, *commit_graph.WRITE_CLI_ARGS)
+        self.assertEqual(commit_graph.inspect(self.git_dir), commit_graph.STATUS_OK)
+
+    def test_split_graph(self):
+        git(self.repo, *(commit_graph.WRITE_CLI_ARGS + ["--split"]))
+        self.assertEqual(commit_graph.inspect(self.git_dir), commit_graph.STATUS_OK)
@@ -0,0 +1,107 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import unittest
+
+# This file is ran both by UnitTesting inside Sublime Text and by plain `unittest`
+# outside of it, where the tests directory isn't necessarily importable.
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import fake_git  # noqa: E402
+
+SHA = "4a3eb02f"
+FILE_TEXT = "line one\nline two\n"
+
+
+@unittest.skipIf(fake_git.running_inside_sublime(), "Runs a separate Python process")
+@unittest.skipIf(sys.platform == "win32", "The fake git is a shebang script")
+class TestHeadless(unittest.TestCase):
+    def setUp(self):
+        self.git = fake_git.FakeGit()
+        self.git.install()
+        self.git.respond(["ls-files"], "a.py\0")
+        self.git.respond(["--pretty=format:%s"], "Commit subject")
+        self.git.respond(
+            ["log"],
+            "".join(
+                "{0:040x}\0{0:08x}\0Tom van Ommeren\0"
+                "2019-11-27\0Change {0}\n".format(n)
+                for n in range(5)
+            ),
+        )
+        self.git.respond(
+            ["blame"],
+            "".join(
+                "{0} a.py (A 2019-11-27 21:42:13 +0100 {1}) x\n".format(SHA, n)
+                for n in (1, 2)
+            ),
+        )
+        self.worktree, self.path = fake_git.make_fake_repo("a.py", FILE_TEXT)
+
+    def tearDown(self):
+        self.git.uninstall()
+        shutil.rmtree(self.worktree, ignore_errors=True)
+
+    def python(self, *args):
+        return subprocess.check_output(
+            [sys.executable] + list(args), cwd=fake_git.PKG_DIR
+        ).decode()
+
+    def test_engine_does_not_need_sublime(self):
+        output = self.python(
+            "-c",
+            "import sys, src.engine, src.headless; print('sublime' in sys.modules)",
+        )
+        self.assertEqual(output.strip(), "False")
+
+    def test_blame_and_commits(self):
+        output = self.python(
+            "-m", "src.headless", self.path, "--commits", "--repeat", "2", "--json"
+        )
+        runs = json.loads(output)["runs"]
+        self.assertEqual(
+            [(r["pass"], r["operation"], r["git_processes"]) for r in runs],
+            [
+                # Listing the tracked files, then the blame itself.
+                (1, "blame", 2),
+                (1, "commits", 1),
+                # Everything is cached by then.
+                (2, "blame", 0),
+                (2, "commits", 0),
+            ],
+        )
+
+    def test_inline_blame_and_history(self):
+        output = self.python(
+            "-m",
+            "src.headless",
+            self.path,
+            "--lines",
+            "1-2",
+            "--inline",
+            "--history",
+            "3",
+            "--json",
+        )
+        runs = json.loads(output)["runs"]
+        self.assertEqual(
+            [(r["operation"], r["queries"], r["git_processes"]) for r in runs],
+            [
+                # Listing the tracked files, then blaming each line.
+                ("blame", 2, 3),
+                ("history", 1, 1),
+            ],
+        )
+        self.assertIsNotNone(runs[0]["median_delay_ms"])
+        self.assertIn(["log"], [args[:1] for args in self.git.invocations()])
+
+    def test_table_shows_the_debounce_delay(self):
+        output = self.python(
+            "-m", "src.headless", self.path, "--lines", "1-2", "--inline", "--commits"
+        )
+        header, blame_row, commits_row = output.splitlines()
+        self.assertIn("delay_ms", header.split())
+        # The configured delay, as nothing has been measured before the first line.
+        self.assertIn("300.0", blame_row.split())
+        self.assertEqual(commits_row.split()[-2], "-")
@@ -0,0 +1,120 @@
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+import zipfile
+from unittest import mock
+
+# This file is ran both by UnitTesting inside Sublime Text and by plain `unittest`
+# outside of it, where the tests directory isn't necessarily importable.
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import fake_git  # noqa: E402
+
+helper = fake_git.import_package_module("src.helper")
+
+
+@unittest.skipIf(fake_git.running_inside_sublime(), "Needs the stub sublime module")
+@unittest.skipUnless(helper.is_supported(), "Needs Unix domain sockets")
+class TestHelper(unittest.TestCase):
+    def setUp(self):
+        self.git = fake_git.FakeGit()
+        self.git.install()
+        self.git.respond(["show", "abc123"], "commit abc123\n")
+        self.git.respond(["show"], "fatal: bad object\n", exit_code=128)
+        self.socket_path = os.path.join(self.git.bin_dir, "helper.sock")
+
+    def tearDown(self):
+        self.git.uninstall()
+
+    def client(self):
+        return helper.HelperClient(self.socket_path, sys.executable, 1, 16)
+
+    def test_results_are_shared_via_the_helper(self):
+        server = helper.HelperServer(self.socket_path, 1, 16)
+        thread = threading.Thread(target=server.serve)
+        thread.start()
+        while not os.path.exists(self.socket_path):
+            time.sleep(0.01)
+
+        cwd = tempfile.gettempdir()
+        for _ in range(3):
+            output = self.client().run_git(cwd, ["show", "abc123"], ["k", "abc123"])
+            self.assertEqual(output, "commit abc123\n")
+        self.assertEqual(self.git.invocations(), [["show", "abc123"]])
+
+        with self.assertRaises(subprocess.CalledProcessError) as cm:
+            self.client().run_git(cwd, ["show", "zzz"])
+        self.assertEqual(cm.exception.returncode, 128)
+        self.assertEqual(cm.exception.output, b"fatal: bad object\n")
+
+        # It goes away by itself once idle.
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertFalse(os.path.exists(self.socket_path))
+
+    def test_client_starts_the_helper_on_demand(self):
+        output = self.client().run_git(tempfile.gettempdir(), ["show", "abc123"])
+        self.assertEqual(output, "commit abc123\n")
+        self.assertTrue(os.path.exists(self.socket_path))
+        # The helper ran from a copy of its script, not from the package.
+        self.assertTrue(os.path.exists(os.path.join(self.git.bin_dir, "helper.py")))
+
+    def test_script_can_be_read_from_a_zipped_package(self):
+        archive_path = os.path.join(self.git.bin_dir, "Git blame.sublime-package")
+        with zipfile.ZipFile(archive_path, "w") as archive:
+            archive.writestr("src/helper.py", "# helper\n")
+        self.assertEqual(
+            helper.read_package_file(os.path.join(archive_path, "src", "helper.py")),
+            b"# helper\n",
+        )
+        with self.assertRaises(helper.HelperUnavailable):
+            helper.read_package_file(os.path.join(archive_path, "src", "cache.py"))
+
+    def test_unreachable_helper(self):
+        client = helper.HelperClient(self.socket_path, "/nonexistent/python", 1, 16)
+        with self.assertRaises(helper.HelperUnavailable):
+            client.run_git(tempfile.gettempdir(), ["show", "abc123"])
+        self.assertEqual(self.git.invocations(), [])
+
+    def test_socket_lives_in_a_private_directory(self):
+        os.environ["XDG_RUNTIME_DIR"] = self.git.bin_dir
+        socket_dir = os.path.dirname(helper.default_socket_path())
+        self.assertEqual(os.stat(socket_dir).st_mode & 0o777, 0o700)
+
+        os.chmod(socket_dir, 0o755)
+        with self.assertRaises(helper.HelperUnavailable):
+            helper.default_socket_path()
+
+    def test_socket_of_another_user_is_refused(self):
+        server = helper.HelperServer(self.socket_path, 1, 16)
+        thread = threading.Thread(target=server.serve)
+        thread.start()
+        self.addCleanup(thread.join, 5)
+        while not os.path.exists(self.socket_path):
+            time.sleep(0.01)
+
+        other_uid = os.stat(self.socket_path).st_uid + 1
+        with mock.patch.object(helper.os, "getuid", return_value=other_uid):
+            with self.assertRaises(helper.HelperUnavailable):
+                self.client().run_git(tempfile.gettempdir(), ["show", "abc123"])
+        self.assertEqual(self.git.invocations(), [])
+
+    def test_unresponsive_helper(self):
+        # Accepts connections (into the backlog), but never answers.
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.addCleanup(listener.close)
+        listener.bind(self.socket_path)
+        listener.listen(1)
+
+        started_at = time.time()
+        with self.assertRaises(helper.HelperUnavailable):
+            self.client().run_git(
+                tempfile.gettempdir(), ["show", "abc123"], timeout=0.1
+            )
+        self.assertLess(
+            time.time() - started_at, 0.1 + helper.RESPONSE_TIMEOUT_MARGIN_SECONDS + 1
+        )
@@ -0,0 +1,50 @@
+import importlib
+import unittest
+from unittest import mock
+
+# This strange form of import is required because our ST package name has a space in it.
+latency = importlib.import_module("Git blame.src.latency")
+engine = importlib.import_module("Git blame.src.engine")
+repo = importlib.import_module("Git blame.src.repo")
+
+
+class TestLatency(unittest.TestCase):
+    def test_lookup_ms(self):
+        tracker = latency.LatencyTracker()
+        self.assertIsNone(tracker.lookup_ms("repo"))
+        tracker.record("repo", 800.0, cache_hit=False)
+        self.assertEqual(tracker.lookup_ms("repo"), 800.0)
+        # Cache hits are already shown without any delay, so they don't count.
+        tracker.record("repo", 1.0, cache_hit=True)
+        self.assertEqual(tracker.lookup_ms("repo"), 800.0)
+        self.assertAlmostEqual(tracker.stats()["repo"]["hit_rate"], 0.3)
+        tracker.record("repo", 400.0, cache_hit=False)
+        self.assertAlmostEqual(tracker.lookup_ms("repo"), 800.0 + 0.3 * (400.0 - 800.0))
+        self.assertIsNone(tracker.lookup_ms("other repo"))
+
+    def test_inline_blame_delay(self):
+        path = "/nonexistent/repo/a.py"
+        blame_engine = engine.BlameEngine(
+            {
+                "inline_blame_delay": 300,
+                "inline_blame_adaptive_delay": True,
+                "inline_blame_delay_max": 1500,
+            }
+        )
+        tracker = latency.LatencyTracker()
+        with mock.patch.object(engine, "inline_blame_latency", tracker):
+            self.assertEqual(blame_engine.inline_blame_delay_ms(path), 300)
+
+            tracker.record(repo.repo_key(path), 800.0, cache_hit=False)
+            for _ in range(5):
+                tracker.record(repo.repo_key(path), 1.0, cache_hit=True)
+            # However many lookups are cached, those that aren't still take as long.
+            self.assertEqual(blame_engine.inline_blame_delay_ms(path), 800.0)
+
+            tracker.record(repo.repo_key(path), 5000.0, cache_hit=False)
+            self.assertEqual(blame_engine.inline_blame_delay_ms(path), 1500)
+
+            # Never less than the configured delay.
+            for _ in range(20):
+                tracker.record(repo.repo_key(path), 10.0, cache_hit=False)
+            self.assertEqual(blame_engine.inline_blame_delay_ms(path), 300)
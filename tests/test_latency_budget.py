@@ -0,0 +1,129 @@
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import unittest
+
+# This file is ran both by UnitTesting inside Sublime Text and by plain `unittest`
+# outside of it, where the tests directory isn't necessarily importable.
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import fake_git  # noqa: E402
+
+SHA = "4a3eb02f"
+FILE_TEXT = "line one\nline two\n"
+
+
+@unittest.skipIf(fake_git.running_inside_sublime(), "Needs the stub sublime module")
+@unittest.skipIf(sys.platform == "win32", "The fake git is a shebang script")
+class TestLatencyBudget(unittest.TestCase):
+    def setUp(self):
+        base = fake_git.import_package_module("src.base")
+        self.sublime = base.sublime
+        self.sublime.reset()
+        base.paths_too_slow_for_expensive_blame.clear()
+        fake_git.import_package_module("src.cache").blame_cache.clear()
+        self.blame = fake_git.import_package_module("src.blame")
+        self.blame_inline = fake_git.import_package_module("src.blame_inline")
+        self.engine = fake_git.import_package_module("src.engine")
+
+        settings = self.sublime.load_settings("Git blame.sublime-settings")
+        settings.set("latency_budgets_ms", {"inline": 300, "line": 300})
+        settings.set("prefetch_commit_details", False)
+
+        self.git = fake_git.FakeGit()
+        self.git.install()
+        self.git.respond(["ls-files"], "a.py\0")
+        self.worktree, self.path = fake_git.make_fake_repo("a.py", FILE_TEXT)
+        self.view = self.sublime.View(file_name=self.path, text=FILE_TEXT)
+
+    def tearDown(self):
+        self.git.uninstall()
+        shutil.rmtree(self.worktree, ignore_errors=True)
+
+    def test_falls_back_to_cheap_blame(self):
+        self.git.respond(["--minimal"], "", sleep=5)
+        self.git.respond(
+            ["blame"],
+            "{0} a.py (A 2019-11-27 21:42:13 +0100 1) line one\n".format(SHA),
+        )
+        cmd = self.blame.Blame(self.view)
+
+        started_at = time.time()
+        cmd.run(None)
+        self.assertLess(time.time() - started_at, 3)
+        self.assertEqual(len(self.view.phantoms[cmd.phantom_set_key()]), 1)
+        self.assertEqual(
+            [args[2] for args in self.git.invocations() if args[0] == "blame"],
+            ["--minimal", "-w"],
+        )
+
+        # Now known to be slow, so the expensive blame isn't attempted again.
+        self.git.reset()
+        cmd.close_by_user_request()
+        self.view.set_carets(1)
+        cmd.run(None)
+        self.assertNotIn("--minimal", self.git.invocations()[0])
+
+    def test_coalesced_callers_all_fall_back(self):
+        self.git.respond(["--minimal"], "", sleep=5)
+        self.git.respond(
+            ["blame"],
+            "{0} a.py (A 2019-11-27 21:42:13 +0100 1) line one\n".format(SHA),
+        )
+        settings = self.sublime.load_settings("Git blame.sublime-settings")
+        results = []
+
+        def blame():
+            engine = self.engine.BlameEngine(settings, latency_budget_mode="line")
+            try:
+                results.append(engine.get_blame_text(self.path, ["-L", "1,1"]))
+            except Exception as e:
+                results.append(e)
+
+        threads = [threading.Thread(target=blame) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(len(results), 3)
+        for result in results:
+            self.assertIn(SHA, result)
+        # The expensive blame timed out once for all of them.
+        self.assertEqual(
+            [args[2] for args in self.git.invocations() if args[0] == "blame"],
+            ["--minimal", "-w"],
+        )
+
+    def test_callers_with_a_bigger_budget_are_not_cut_short(self):
+        self.git.respond(["show"], "commit {0}\n".format(SHA), sleep=1)
+        settings = self.sublime.load_settings("Git blame.sublime-settings")
+        settings.set("latency_budgets_ms", {"inline": 300, "line": 15000})
+        results = {}
+
+        def show(mode):
+            engine = self.engine.BlameEngine(settings, latency_budget_mode=mode)
+            try:
+                results[mode] = engine.get_commit_fulltext(SHA, self.path)
+            except Exception as e:
+                results[mode] = e
+
+        threads = [
+            threading.Thread(target=show, args=(mode,)) for mode in ("inline", "line")
+        ]
+        for thread in threads:
+            thread.start()
+            time.sleep(0.05)
+        for thread in threads:
+            thread.join(5)
+        self.assertIsInstance(results["inline"], subprocess.TimeoutExpired)
+        self.assertEqual(results["line"], "commit {0}\n".format(SHA))
+
+    def test_inline_annotation_on_timeout(self):
+        self.git.respond(["blame"], "", sleep=5)
+        listener = self.blame_inline.BlameInlineListener(self.view)
+        phantoms = self.view.phantoms[listener.phantom_set_key()]
+        self.assertEqual(len(phantoms), 1)
+        self.assertIn("timed out", phantoms[0].content)
+        self.assertEqual(self.sublime.error_messages, [])
@@ -0,0 +1,129 @@
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+# This file is ran both by UnitTesting inside Sublime Text and by plain `unittest`
+# outside of it, where the tests directory isn't necessarily importable.
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import fake_git  # noqa: E402
+
+
+def git(cwd, *args):
+    return subprocess.check_output(
+        ["git", "-c", "user.name=A", "-c", "user.email=a@example.com"] + list(args),
+        cwd=cwd,
+        stderr=subprocess.STDOUT,
+    ).decode()
+
+
+def git_version():
+    try:
+        match = re.search(r"(\d+)\.(\d+)", git(None, "--version"))
+    except OSError:
+        return None
+    return (int(match.group(1)), int(match.group(2))) if match else None
+
+
+@unittest.skipIf(fake_git.running_inside_sublime(), "Needs the stub sublime module")
+@unittest.skipUnless(git_version(), "Needs git")
+class TestPartialClone(unittest.TestCase):
+    def setUp(self):
+        base = fake_git.import_package_module("src.base")
+        self.base = base
+        self.sublime = base.sublime
+        self.sublime.reset()
+        fake_git.import_package_module("src.cache").blame_cache.clear()
+        self.repo = fake_git.import_package_module("src.repo")
+        self.blame = fake_git.import_package_module("src.blame")
+        self.blame_backfill = fake_git.import_package_module("src.blame_backfill")
+        self.sublime.load_settings("Git blame.sublime-settings").set(
+            "prefetch_commit_details", False
+        )
+
+        self.tmp = tempfile.mkdtemp()
+        origin = os.path.join(self.tmp, "origin")
+        os.mkdir(origin)
+        git(origin, "init", "-q")
+        git(origin, "config", "uploadpack.allowFilter", "true")
+        for i in range(3):
+            with open(os.path.join(origin, "a.txt"), "a") as f:
+                f.write("line {0}\n".format(i))
+            git(origin, "add", "a.txt")
+            git(origin, "commit", "-q", "-m", "commit {0}".format(i))
+
+        self.clone = os.path.join(self.tmp, "clone")
+        git(
+            self.tmp,
+            "clone",
+            "-q",
+            "--filter=blob:none",
+            "file://" + origin,
+            self.clone,
+        )
+        self.path = os.path.join(self.clone, "a.txt")
+        with open(self.path) as f:
+            text = f.read()
+        self.view = self.sublime.View(file_name=self.path, text=text)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_detection(self):
+        self.assertTrue(self.repo.is_partial_clone(self.repo.find_repo(self.path)))
+        origin_file = os.path.join(self.tmp, "origin", "a.txt")
+        self.assertFalse(self.repo.is_partial_clone(self.repo.find_repo(origin_file)))
+
+    def test_unreachable_promisor_remote(self):
+        # Regardless of git version, a fetch that can't succeed is reported as missing
+        # history rather than as an opaque git error.
+        os.rename(os.path.join(self.tmp, "origin"), os.path.join(self.tmp, "gone"))
+        cmd = self.blame.Blame(self.view)
+        cmd.run(None)
+        self.assertEqual(len(self.sublime.error_messages), 1)
+        self.assertIn("Fetch Missing History", self.sublime.error_messages[0])
+
+    def test_blame_never_fetches_lazily(self):
+        if not self.git_honours_no_lazy_fetch():
+            self.skipTest("Needs git that honours GIT_NO_LAZY_FETCH")
+        promisor_packs_before = self.promisor_packs()
+
+        cmd = self.blame.Blame(self.view)
+        self.view.set_carets(0)
+        cmd.run(None)
+        self.assertEqual(len(self.sublime.error_messages), 1)
+        self.assertIn("not available locally", self.sublime.error_messages[0])
+        self.assertEqual(self.promisor_packs(), promisor_packs_before)
+
+        self.blame_backfill.BlameFetchMissingHistory(self.view).run(None)
+        self.assertNotEqual(self.promisor_packs(), promisor_packs_before)
+
+        cmd.run(None)
+        self.assertEqual(len(self.sublime.error_messages), 1)
+        self.assertEqual(len(self.view.phantoms[cmd.phantom_set_key()]), 1)
+
+    def git_honours_no_lazy_fetch(self):
+        """
+        Whether git refuses to fetch a missing object when told not to. Going by the
+        version number wouldn't do, as it was backported to older maintenance releases.
+        """
+        # Only the checked out version of the file has been fetched so far.
+        missing_sha = git(self.clone, "rev-parse", "HEAD~2:a.txt").strip()
+        promisor_packs_before = self.promisor_packs()
+        try:
+            subprocess.check_output(
+                ["git", "cat-file", "-p", missing_sha],
+                cwd=self.clone,
+                env=dict(os.environ, GIT_NO_LAZY_FETCH="1"),
+                stderr=subprocess.STDOUT,
+            )
+        except subprocess.CalledProcessError:
+            return self.promisor_packs() == promisor_packs_before
+        return False
+
+    def promisor_packs(self):
+        pack_dir = os.path.join(self.clone, ".git", "objects", "pack")
+        return sorted(p for p in os.listdir(pack_dir) if p.endswith(".promisor"))
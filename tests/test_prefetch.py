@@ -0,0 +1,61 @@
+import importlib
+import threading
+import unittest
+
+# This strange form of import is required because our ST package name has a space in it.
+prefetch = importlib.import_module("Git blame.src.prefetch")
+cache = importlib.import_module("Git blame.src.cache")
+
+
+class TestPrefetch(unittest.TestCase):
+    def test_byte_cap(self):
+        size = cache.estimate_size("123456")
+        forgotten = []
+        p = prefetch.Prefetcher(max_bytes=size * 3 // 2)
+        for name in ("a", "b"):
+            p.submit(
+                (1, "x"), lambda: "123456", lambda name=name: forgotten.append(name)
+            )
+        self.assertTrue(p.wait_until_idle(5))
+        # The second was fetched, but was too big to keep.
+        self.assertEqual(p.prefetched_bytes, size)
+        self.assertEqual(forgotten, ["b"])
+
+        # Cancelling frees up the cap again.
+        p.cancel((1, "x"))
+        self.assertEqual(p.prefetched_bytes, 0)
+
+        # Once the cap has been reached, nothing more is even attempted.
+        p.max_bytes = size
+        fetched = []
+        for name in ("c", "d"):
+            p.submit((1, "x"), lambda name=name: fetched.append(name) or "123456", None)
+        self.assertTrue(p.wait_until_idle(5))
+        self.assertEqual(fetched, ["c"])
+        self.assertEqual(p.stats()["over_budget"], 2)
+
+    def test_cancel_drops_queued_jobs(self):
+        gate = threading.Event()
+        fetched = []
+
+        def fetch(name):
+            gate.wait(5)
+            fetched.append(name)
+            return name
+
+        p = prefetch.Prefetcher()
+        p.submit((1, "x"), lambda: fetch("in flight"), lambda: None)
+        p.submit((1, "x"), lambda: fetch("queued"), lambda: None)
+        p.submit((2, "x"), lambda: fetch("other view"), lambda: None)
+        p.cancel_view(1)
+        gate.set()
+        self.assertTrue(p.wait_until_idle(5))
+        self.assertNotIn("queued", fetched)
+        self.assertIn("other view", fetched)
+        self.assertEqual(p.prefetched_bytes, cache.estimate_size("other view"))
+
+    def test_counts_bytes_rather_than_characters(self):
+        p = prefetch.Prefetcher()
+        p.submit((1, "x"), lambda: "\u4e2d\u6587" * 100, lambda: None)
+        self.assertTrue(p.wait_until_idle(5))
+        self.assertGreater(p.prefetched_bytes, 400)
@@ -0,0 +1,83 @@
+import importlib
+import threading
+import time
+import unittest
+
+# This strange form of import is required because our ST package name has a space in it.
+singleflight = importlib.import_module("Git blame.src.singleflight")
+
+
+class TestSingleFlight(unittest.TestCase):
+    def wait_for_coalesced(self, flight, n):
+        deadline = time.time() + 5
+        while flight.stats()["coalesced"] < n and time.time() < deadline:
+            time.sleep(0.001)
+
+    def run_concurrently(self, flight, key, fn, n):
+        results = []
+        errors = []
+
+        def call():
+            try:
+                results.append(flight.run(key, fn, label="blame"))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(n)]
+        for thread in threads:
+            thread.start()
+        return threads, results, errors
+
+    def test_overlapping_calls_are_coalesced(self):
+        flight = singleflight.SingleFlight()
+        gate = threading.Event()
+        calls = []
+
+        def fn():
+            calls.append(1)
+            gate.wait(5)
+            return "output"
+
+        threads, results, errors = self.run_concurrently(flight, "k", fn, 3)
+        # Only let the first call finish once the others are waiting on it.
+        self.wait_for_coalesced(flight, 2)
+        gate.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(calls, [1])
+        self.assertEqual(results, ["output"] * 3)
+        self.assertEqual(errors, [])
+        self.assertEqual(
+            flight.stats(),
+            {
+                "in_flight": 0,
+                "started": 1,
+                "coalesced": 2,
+                "coalesced_by_label": {"blame": 2},
+            },
+        )
+
+    def test_waiters_receive_the_exception(self):
+        flight = singleflight.SingleFlight()
+        gate = threading.Event()
+
+        def fn():
+            gate.wait(5)
+            raise ValueError("git failed")
+
+        threads, results, errors = self.run_concurrently(flight, "k", fn, 2)
+        self.wait_for_coalesced(flight, 1)
+        gate.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, [])
+        self.assertEqual([str(e) for e in errors], ["git failed"] * 2)
+
+    def test_finished_calls_are_not_remembered(self):
+        flight = singleflight.SingleFlight()
+        self.assertEqual(flight.run("k", lambda: 1), 1)
+        self.assertEqual(flight.run("k", lambda: 2), 2)
+        self.assertEqual(flight.stats()["started"], 2)
+        self.assertEqual(flight.stats()["coalesced"], 0)
@@ -0,0 +1,355 @@
+import os
+import shutil
+import sys
+import threading
+import unittest
+
+# This file is ran both by UnitTesting inside Sublime Text and by plain `unittest`
+# outside of it, where the tests directory isn't necessarily importable.
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import fake_git  # noqa: E402
+
+SHA = "4a3eb02f"
+PREV_SHA = "c937eff9"
+FILE_TEXT = "line one\nline two\nline three\nline four\nline five\n"
+
+
+def blame_line(sha, line_num, text="x"):
+    return "{0} a.py (Tom van Ommeren 2019-11-27 21:42:13 +0100 {1}) {2}\n".format(
+        sha, line_num, text
+    )
+
+
+def blame_line_relative(sha, line_num):
+    return "{0} a.py (Tom van Ommeren 2 years ago {1}) x\n".format(sha, line_num)
+
+
+LS_FILES_ARGS = ["ls-files", "-z", "--full-name", ":/"]
+
+
+def blame_args(*extra):
+    return ["blame", "--show-name", "--minimal", "-w"] + list(extra) + ["--", "a.py"]
+
+
+@unittest.skipIf(fake_git.running_inside_sublime(), "Needs the stub sublime module")
+@unittest.skipIf(sys.platform == "win32", "The fake git is a shebang script")
+class TestSpawnBudget(unittest.TestCase):
+    """
+    Every user action has a budget of git child processes. If one of these tests
+    fails because a change made an action spawn more (or different) processes, either
+    the change is a regression, or the budget here needs consciously updating.
+    """
+
+    def setUp(self):
+        self.sublime = fake_git.import_package_module("src.base").sublime
+        self.sublime.reset()
+        fake_git.import_package_module("src.cache").blame_cache.clear()
+        fake_git.import_package_module("src.engine").commits_too_big_to_prefetch.clear()
+        self.prefetcher = fake_git.import_package_module(
+            "src.prefetch"
+        ).commit_prefetcher
+        self.blame = fake_git.import_package_module("src.blame")
+        self.blame_all = fake_git.import_package_module("src.blame_all")
+        self.blame_inline = fake_git.import_package_module("src.blame_inline")
+        self.blame_history = fake_git.import_package_module("src.blame_history")
+        self.blame_instadiff = fake_git.import_package_module("src.blame_instadiff")
+
+        self.git = fake_git.FakeGit()
+        self.git.install()
+        self.worktree, self.path = fake_git.make_fake_repo("a.py", FILE_TEXT)
+        self.view = self.sublime.View(file_name=self.path, text=FILE_TEXT)
+
+        for n in range(1, 6):
+            self.git.respond(
+                ["--ignore-rev", SHA, "-L", "{0},{0}".format(n)],
+                blame_line(PREV_SHA, n),
+            )
+            self.git.respond(
+                ["-L", "{0},{0}".format(n), "--date=relative"],
+                blame_line_relative(SHA, n),
+            )
+            self.git.respond(["-L", "{0},{0}".format(n)], blame_line(SHA, n))
+        self.git.respond(["ls-files"], "a.py\0")
+        self.git.respond(["--pretty=format:%s"], "Commit subject")
+        self.git.respond(["show"], "commit {0}\n\nCommit subject\n".format(SHA))
+        self.git.respond(["blame"], "".join(blame_line(SHA, n) for n in range(1, 6)))
+
+    def tearDown(self):
+        self.git.uninstall()
+        shutil.rmtree(self.worktree, ignore_errors=True)
+
+    def assertSpawned(self, expected):
+        self.assertTrue(self.prefetcher.wait_until_idle(5))
+        self.assertEqual(self.git.invocations(), expected)
+        self.git.reset()
+
+    def subject_args(self, sha=SHA):
+        return ["show", "--no-color", sha, "--pretty=format:%s", "--no-patch"]
+
+    def show_args(self, sha=SHA):
+        return ["show", "--no-color", sha]
+
+    # ------------------------------------------------------------
+
+    def test_caret_move(self):
+        self.sublime.load_settings("Git blame.sublime-settings").set(
+            "inline_blame_delay", 0
+        )
+        listener = self.blame_inline.BlameInlineListener(self.view)
+        # The initially selected line is blamed as soon as the view is opened, and
+        # the commit's details are prefetched in case [Show] is clicked.
+        self.assertSpawned(
+            [
+                LS_FILES_ARGS,
+                blame_args("-L", "1,1", "--date=relative"),
+                self.subject_args(),
+                self.show_args(),
+            ]
+        )
+
+        self.view.set_carets(2)
+        listener.on_selection_modified_async()
+        listener.timer.join()
+        # The commit subject and details are already known from line 1.
+        self.assertSpawned([blame_args("-L", "3,3", "--date=relative")])
+
+        # Moving back to an already blamed line needs no processes at all.
+        self.view.set_carets(0)
+        listener.on_selection_modified_async()
+        listener.timer.join()
+        self.assertSpawned([])
+
+    def test_caret_moves_onto_a_commit_too_big_to_prefetch(self):
+        settings = self.sublime.load_settings("Git blame.sublime-settings")
+        settings.set("inline_blame_delay", 0)
+        # Smaller than the details of any commit.
+        settings.set("prefetch_max_kb", 0.01)
+        listener = self.blame_inline.BlameInlineListener(self.view)
+        self.assertSpawned(
+            [
+                LS_FILES_ARGS,
+                blame_args("-L", "1,1", "--date=relative"),
+                self.subject_args(),
+                self.show_args(),
+            ]
+        )
+
+        # Every line is from the same commit, which isn't fetched again.
+        for row in range(1, 5):
+            self.view.set_carets(row)
+            listener.on_selection_modified_async()
+            listener.timer.join()
+            self.assertSpawned(
+                [blame_args("-L", "{0},{0}".format(row + 1), "--date=relative")]
+            )
+
+    def test_prev(self):
+        cmd = self.blame.Blame(self.view)
+        self.view.set_carets(1)
+        cmd.run(None)
+        self.assertSpawned([LS_FILES_ARGS, blame_args("-L", "2,2"), self.show_args()])
+
+        cmd.handle_phantom_button("prev?sha={0}&row_num=1".format(SHA))
+        self.assertSpawned(
+            [blame_args("-L", "2,2", "--ignore-rev", SHA), self.show_args(PREV_SHA)]
+        )
+
+    def test_show(self):
+        cmd = self.blame.Blame(self.view)
+        cmd.handle_phantom_button("show?sha={0}".format(SHA))
+        self.assertSpawned([self.show_args()])
+
+        # Showing the same commit again is answered from the cache.
+        cmd.handle_phantom_button("show?sha={0}".format(SHA))
+        self.assertSpawned([])
+
+    def test_show_after_prefetch(self):
+        cmd = self.blame.Blame(self.view)
+        cmd.run(None)
+        self.assertSpawned([LS_FILES_ARGS, blame_args("-L", "1,1"), self.show_args()])
+
+        cmd.handle_phantom_button("show?sha={0}".format(SHA))
+        self.assertSpawned([])
+
+    def test_show_all(self):
+        cmd = self.blame_all.BlameShowAll(self.view)
+        cmd.run(None)
+        self.assertSpawned([LS_FILES_ARGS, blame_args()])
+        self.assertEqual(
+            len(self.view.phantoms[cmd.phantom_set_key()]), FILE_TEXT.count("\n")
+        )
+
+    def test_concurrent_show_all(self):
+        self.git.respond(
+            ["blame", "--show-name", "--minimal", "-w", "--", "a.py"],
+            "".join(blame_line(SHA, n) for n in range(1, 6)),
+            sleep=0.5,
+            override=True,
+        )
+        clone = self.sublime.View(file_name=self.path, text=FILE_TEXT)
+        threads = [
+            threading.Thread(target=self.blame_all.BlameShowAll(view).run, args=[None])
+            for view in (self.view, clone)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # Both views get their phantoms from the one git process.
+        self.assertSpawned([LS_FILES_ARGS, blame_args()])
+        for view in (self.view, clone):
+            self.assertEqual(
+                len(view.phantoms[self.blame_all.BlameShowAll.phantom_set_key()]), 5
+            )
+
+    def test_multi_caret_blame(self):
+        cmd = self.blame.Blame(self.view)
+        self.view.set_carets(0, 2, 4)
+        cmd.run(None)
+        self.assertSpawned(
+            [
+                LS_FILES_ARGS,
+                blame_args("-L", "1,1"),
+                blame_args("-L", "3,3"),
+                blame_args("-L", "5,5"),
+                self.show_args(),
+            ]
+        )
+        self.assertEqual(len(self.view.phantoms[cmd.phantom_set_key()]), 3)
+
+    def test_instadiff(self):
+        cmd = self.blame_instadiff.BlameInstadiff(self.view)
+        self.view.set_carets(3)
+        cmd.run(None)
+        self.assertSpawned([LS_FILES_ARGS, blame_args("-L", "4,4"), self.show_args()])
+
+    def test_depth_bound(self):
+        self.sublime.load_settings("Git blame.sublime-settings").set(
+            "blame_since", "2.years.ago"
+        )
+        self.git.respond(
+            ["--since=2.years.ago", "-L", "2,2"],
+            blame_line("^" + SHA, 2),
+            override=True,
+        )
+        cmd = self.blame.Blame(self.view)
+        self.view.set_carets(1)
+        cmd.run(None)
+        self.assertSpawned(
+            [
+                LS_FILES_ARGS,
+                blame_args("-L", "2,2", "--root", "--since=2.years.ago"),
+                self.show_args(),
+            ]
+        )
+        phantom = self.view.phantoms[cmd.phantom_set_key()][0]
+        self.assertIn("last changed before 2.years.ago", phantom.content)
+
+        # Going further back than the bound drops it, rather than skipping the
+        # boundary commit (which isn't what last changed the line).
+        cmd.handle_phantom_button(
+            "prev?sha=^{0}&row_num=1&unbounded=1&boundary=1".format(SHA)
+        )
+        self.assertSpawned([blame_args("-L", "2,2")])
+
+    def test_depth_bound_by_revision(self):
+        settings = self.sublime.load_settings("Git blame.sublime-settings")
+        settings.set("blame_since_revision", "v2.0")
+        cmd = self.blame.Blame(self.view)
+        cmd.run(None)
+        # A range would make git blame the file as of its end, not as it is on disk.
+        self.assertSpawned(
+            [
+                LS_FILES_ARGS,
+                blame_args("-L", "1,1", "--root", "^v2.0"),
+                self.show_args(),
+            ]
+        )
+
+        settings.set("blame_since_revision", "v2.0..HEAD")
+        self.view.set_carets(1)
+        cmd.run(None)
+        self.assertSpawned([blame_args("-L", "2,2")])
+
+    def test_untracked_file(self):
+        path = os.path.join(self.worktree, "build", "generated.py")
+        os.mkdir(os.path.dirname(path))
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(FILE_TEXT)
+        view = self.sublime.View(file_name=path, text=FILE_TEXT)
+        self.sublime.load_settings("Git blame.sublime-settings").set(
+            "inline_blame_delay", 0
+        )
+        listener = self.blame_inline.BlameInlineListener(view)
+        self.assertSpawned([LS_FILES_ARGS])
+
+        # Once the tracked files are known, untracked ones cost nothing.
+        view.set_carets(2)
+        listener.on_selection_modified_async()
+        self.blame.Blame(view).run(None)
+        self.assertSpawned([])
+        self.assertIn("not tracked", self.sublime.error_messages[0])
+
+        # Until the index changes (e.g. because the file got added).
+        index_path = os.path.join(self.worktree, ".git", "index")
+        with open(index_path, "w", encoding="utf-8") as f:
+            f.write("changed")
+        self.git.respond(["ls-files"], "a.py\0build/generated.py\0", override=True)
+        self.blame.Blame(view).run(None)
+        self.assertSpawned(
+            [
+                LS_FILES_ARGS,
+                blame_args("-L", "3,3")[:-1] + ["generated.py"],
+                self.show_args(),
+            ]
+        )
+
+    def test_file_history(self):
+        self.git.respond(
+            ["log"],
+            "".join(
+                "{0:040x}\0{0:08x}\0Tom van Ommeren\0"
+                "2019-11-27\0Change {0}\n".format(n)
+                for n in range(150)
+            ),
+        )
+        cmd = self.blame_history.BlameFileHistory(self.view)
+        cmd.run(None)
+        items, on_select, _, _ = self.view.window().quick_panel
+        # The first page, and an entry for loading the next.
+        self.assertEqual(len(items), 101)
+        self.assertEqual(items[2][0], "Change 2")
+
+        on_select(100)
+        items, on_select, selected_index, _ = self.view.window().quick_panel
+        self.assertEqual(len(items), 150)
+        self.assertEqual(selected_index, 100)
+
+        # Each page is read from the same git process.
+        on_select(120)
+        self.assertSpawned(
+            [
+                LS_FILES_ARGS,
+                [
+                    "log",
+                    "--no-color",
+                    "--date=short",
+                    "--format=%H%x00%h%x00%an%x00%ad%x00%s",
+                    "--",
+                    "a.py",
+                ],
+                self.show_args("{0:040x}".format(120)),
+            ]
+        )
+
+    def test_tracked_files_survive_a_tiny_cache_budget(self):
+        self.sublime.load_settings("Git blame.sublime-settings").set(
+            "cache_budget_mb", 0
+        )
+        cmd = self.blame.Blame(self.view)
+        cmd.run(None)
+        self.assertSpawned([LS_FILES_ARGS, blame_args("-L", "1,1"), self.show_args()])
+        # Nothing fits in the cache, but the repo's files needn't be listed again.
+        cmd.close_by_user_request()
+        cmd.run(None)
+        self.assertSpawned([blame_args("-L", "1,1"), self.show_args()])